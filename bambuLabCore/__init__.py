@@ -0,0 +1,3 @@
+# Core of the OBS script for reading status data from a BambuLab X1C
+# Author: Mia Sophie Behrendt; Maker-Hub.de
+# Description: Report pipeline, FTP transfer and rendering shared by obsBambuLabX1Cmqtt36.py and obsBambuLabX1Cmqtt311.py
@@ -0,0 +1,243 @@
+# FTP transfer of the print files from a BambuLab printer
+# Author: Mia Sophie Behrendt; Maker-Hub.de
+# Description: Implicit FTPS client, ranged reads of remote files and the session kept open between downloads
+
+import ssl
+import time
+import ftplib
+import io
+
+from .logger import log
+
+# Timeout of the ftp connection to the printer (seconds)
+ftpTimeout = 30
+
+# An idle ftp session is kept alive with a NOOP after this many seconds
+ftpKeepAliveInterval = 30
+
+
+class ImplicitFTP_TLS(ftplib.FTP_TLS):
+    """FTP_TLS subclass to support implicit FTPS."""
+    """Constructor takes a boolean parameter ignore_PASV_host whether o ignore the hostname"""
+    """in the PASV response, and use the hostname from the session instead"""
+    def __init__(self, *args, **kwargs):
+        self.ignore_PASV_host = kwargs.get('ignore_PASV_host') == True
+        super().__init__(*args, **{k: v for k, v in kwargs.items() if not k == 'ignore_PASV_host'})
+        self._sock = None
+
+    @property
+    def sock(self):
+        """Return the socket."""
+        return self._sock
+
+    @sock.setter
+    def sock(self, value):
+        """When modifying the socket, ensure that it is ssl wrapped."""
+        if value is not None and not isinstance(value, ssl.SSLSocket):
+            value = self.context.wrap_socket(value)
+        self._sock = value
+
+    def ntransfercmd(self, cmd, rest=None):
+        """Override the ntransfercmd method"""
+        conn, size = ftplib.FTP.ntransfercmd(self, cmd, rest)
+        conn = self.sock.context.wrap_socket(
+            conn, server_hostname=self.host, session=self.sock.session
+        )
+        return conn, size        
+     
+    def makepasv(self):
+        host, port = super().makepasv()
+        return (self.host if self.ignore_PASV_host else host), port  
+
+
+class FtpRangeReader(io.RawIOBase):
+    """Seekable read-only file object for a file on an FTP server."""
+    """Only the requested byte ranges are transferred using REST offsets; they are fetched in blocks"""
+    """of blockSize bytes and kept in memory, so zipfile can read single entries of a remote archive."""
+    def __init__(self, ftpClient, fileName, blockSize=131072, checkCancelled=None):
+        super().__init__()
+        self.ftpClient = ftpClient
+        self.fileName = fileName
+        self.blockSize = blockSize
+        self.checkCancelled = checkCancelled
+        self.blocks = {}
+        self.position = 0
+        self.bytesTransferred = 0
+
+        # SIZE is only reliable in binary mode
+        self.ftpClient.voidcmd("TYPE I")
+        self.size = self.ftpClient.size(fileName)
+        if self.size is None:
+            raise ftplib.error_reply("SIZE not supported by the server")
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+
+        if position < 0:
+            raise OSError("negative seek position")
+
+        self.position = position
+        return self.position
+
+    def readinto(self, buffer):
+        end = min(self.position + len(buffer), self.size)
+        if end <= self.position:
+            return 0
+
+        firstBlock = self.position // self.blockSize
+        lastBlock = (end - 1) // self.blockSize
+        self.loadBlocks(firstBlock, lastBlock)
+
+        data = b"".join(self.blocks[index] for index in range(firstBlock, lastBlock + 1))
+        start = self.position - firstBlock * self.blockSize
+        length = end - self.position
+        buffer[:length] = data[start:start + length]
+
+        self.position = end
+        return length
+
+    def loadBlocks(self, firstBlock, lastBlock):
+        """Transfers the missing blocks of the given block range with a single RETR."""
+        missingBlocks = [index for index in range(firstBlock, lastBlock + 1) if index not in self.blocks]
+        if not missingBlocks:
+            return
+
+        offset = missingBlocks[0] * self.blockSize
+        length = min((missingBlocks[-1] + 1) * self.blockSize, self.size) - offset
+        data = self.readRange(offset, length)
+
+        for index in range(missingBlocks[0], missingBlocks[-1] + 1):
+            start = (index - missingBlocks[0]) * self.blockSize
+            self.blocks[index] = data[start:start + self.blockSize]
+
+    def readRange(self, offset, length):
+        """Transfers length bytes starting at offset and aborts the transfer afterwards."""
+        received = bytearray()
+
+        conn = self.ftpClient.transfercmd("RETR " + self.fileName, rest=offset)
+        try:
+            while len(received) < length:
+                if self.checkCancelled is not None:
+                    self.checkCancelled()
+
+                block = conn.recv(min(65536, length - len(received)))
+                if not block:
+                    break
+                received += block
+        finally:
+            conn.close()
+
+        # Closing the data connection early makes the server report an aborted transfer
+        try:
+            self.ftpClient.voidresp()
+        except (ftplib.error_temp, ftplib.error_perm):
+            pass
+
+        if len(received) < length:
+            raise EOFError(f"{self.fileName}: expected {length} bytes at offset {offset}, got {len(received)}")
+
+        self.bytesTransferred += len(received)
+        return bytes(received)
+
+
+class FtpSessionManager:
+    """Keeps a logged in implicit FTPS session to the printer open between model image downloads."""
+    """The idle session is kept alive with NOOP commands and re-established transparently"""
+    """if a reused session turns out to be broken. All sessions use the given TLS context, so they resume"""
+    """the TLS session of the previous one."""
+    def __init__(self, host, port, user, password, context=None):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.context = context
+        self.ftpClient = None
+        self.lastUsed = 0
+
+    def open(self):
+        """Returns the logged in ftp client and connects if there is no open session."""
+        if self.ftpClient is not None:
+            return self.ftpClient
+
+        ftpClient = ImplicitFTP_TLS(context=self.context)
+        ftpClient.connect(host=self.host, port=self.port, timeout=ftpTimeout)
+        try:
+            ftpClient.login(user=self.user, passwd=self.password)
+            ftpClient.prot_p()
+        except:
+            ftpClient.close()
+            raise
+
+        if self.context is not None:
+            self.context.storeSession(ftpClient.sock)
+
+        self.ftpClient = ftpClient
+        self.lastUsed = time.time()
+        return ftpClient
+
+    def drop(self):
+        """Closes the session without logging out, e.g. after a failure."""
+        if self.ftpClient is not None:
+            self.ftpClient.close()
+        self.ftpClient = None
+
+    def close(self):
+        """Logs out and closes the session."""
+        if self.ftpClient is None:
+            return
+
+        try:
+            self.ftpClient.quit()
+        except ftplib.all_errors:
+            pass
+        self.drop()
+
+    def keepAlive(self):
+        """Sends a NOOP if the session has been idle for the keep-alive interval."""
+        if self.ftpClient is None or time.time() - self.lastUsed < ftpKeepAliveInterval:
+            return
+
+        try:
+            self.ftpClient.voidcmd("NOOP")
+            self.lastUsed = time.time()
+        except ftplib.all_errors:
+            self.drop()
+
+    def run(self, operation):
+        """Calls operation with the logged in ftp client and retries once on a new session if a reused one failed."""
+        while True:
+            reused = self.ftpClient is not None
+            ftpClient = self.open()
+            try:
+                result = operation(ftpClient)
+                self.lastUsed = time.time()
+                return result
+            except ModelImageCancelled:
+                # The aborted transfer leaves the control connection in an undefined state
+                self.drop()
+                raise
+            except (OSError, EOFError, ftplib.error_temp, ftplib.error_reply) as e:
+                self.drop()
+                if not reused:
+                    raise
+                log("FTP session lost, reconnecting:", e)
+
+
+class ModelImageCancelled(Exception):
+    """Raised inside a model image download when a newer task has been requested."""
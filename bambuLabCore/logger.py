@@ -0,0 +1,19 @@
+# Logging of the OBS script for BambuLab printers
+# Author: Mia Sophie Behrendt; Maker-Hub.de
+# Description: Writes timestamped messages to the script log of OBS
+
+import datetime
+
+
+"""
+Logs the given message with a timestamp.
+
+Args:
+    *args: Variable number of positional arguments.
+    **kwargs: Variable number of keyword arguments.
+"""
+def log(*args, **kwargs):
+    # Get the current time and format it
+    current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Print the timestamp along with the original message
+    print(f"[{current_time}]", *args, **kwargs)
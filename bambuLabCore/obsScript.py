@@ -0,0 +1,2682 @@
+# OBS python script for reading status data from a BambuLab X1C
+# Author: Mia Sophie Behrendt; Maker-Hub.de
+# Description: Implementation of the script shared by obsBambuLabX1Cmqtt36.py and obsBambuLabX1Cmqtt311.py
+
+import obspython as obs
+import json
+import threading
+import time
+import os
+import re
+import random
+import collections
+
+from .logger import log
+
+# Modules only needed once the printers are serviced; loaded by loadEngineModules() on the first START,
+# so loading the script in OBS and "Reload Scripts" do not pay for paho, TLS, ftp and the event loop
+asyncio = None
+concurrent = None
+ftplib = None
+zipfile = None
+tempfile = None
+shutil = None
+hashlib = None
+pahoCompat = None
+tlsContexts = None
+ftpTransfer = None
+
+# Functions called by OBS; the scripts import them from this module
+__all__ = ["script_description", "script_properties", "script_load", "script_unload", "script_defaults", "script_update"]
+
+# Faster JSON decoders are used for the printer reports if installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+class ProfileStage:
+    """Context manager recording the duration of a pipeline stage if profiling is enabled."""
+    def __init__(self, name, printer=None):
+        self.name = name
+        self.printer = printer
+        self.start = None
+
+    def __enter__(self):
+        if profilingEnabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            recordStage(self.name, self.start, time.perf_counter(), self.printer)
+        return False
+
+# environment variables
+environment = {
+    "host": "",
+    "mqttPort": 8883,
+    "ftpPort": 990,
+    "user": "bblp",
+    "secret": "",
+    "serialNumber": "",
+    "certificateFingerprint": "", # SHA-256 fingerprint of the certificate of the printer; the connection is refused if it differs
+    "printersFile": "", # JSON file with additional printers
+    "interval": 5,
+    "realtime": True, # process reports as they arrive and redraw the sources refreshRate times per second
+    "engineRealtime": True, # Real-time mode of the running engine, copied from realtime at START
+    "refreshRate": 1, # Redraws per second in real-time mode; reports arriving in between are only merged
+    "thread": None, # hold the thread
+    "engineThread": None, # Thread running the event loop which services all printers
+    "eventLoop": None, # Event loop of the engine thread
+    "engineStopEvent": None, # Set to stop the engine
+    "engineTasks": set(), # Running tasks of the engine
+    "printers": [], # Registry of the connected printers, see createPrinter()
+    "imageFolderPath": "", # Path to the images   
+    "modelExecutor": None, # Threads running the blocking ftp transfers of the model images
+    "partialModelDownload": True, # Only transfer the model image entry of the 3mf instead of the whole file
+    "modelCacheSize": 50, # Maximum size of the model image cache in MB
+    "modelSpoolThreshold": 16, # Size in MB up to which a downloaded 3mf file is kept in memory instead of a temporary file
+    "metricsSource": "", # Text source showing the metrics (debug overlay)
+    "metricsFile": "", # File the metrics are written to in the Prometheus text format
+    "profileFile": "" # File the profiling trace is exported to
+}
+
+# Textvariable
+hardenedSteel = "gehärteter Stahl"
+undefine = "nicht definiert"
+stainlessSteel = "Edelstahl"
+singularMinute = "Minute"
+singularHour = "Stunde"
+pluralMinute = "Minuten"
+pluralHour = "Stunden"
+
+# Texts of the connection states shown in the connection status source
+connectionStateTexts = {
+    "connecting": "Verbindung wird aufgebaut",
+    "connected": "Verbunden",
+    "reconnecting": "Verbindung unterbrochen, neuer Versuch in {} s",
+    "unavailable": "Drucker nicht erreichbar, neuer Versuch in {} s",
+    "denied": "Zugangscode falsch",
+    "certificateMismatch": "Zertifikat des Druckers stimmt nicht",
+    "disconnected": "Getrennt"
+}
+
+# Source variable
+sourcesName = {
+    "nozzleType": "",
+    "nozzleTemp": "",
+    "bedTemp": "",
+    "chamberTemp": "",
+    "remainingTime": "",
+    "layer": "",
+    "filament": "",
+    "filamentColor": "",
+    "percentFinish": "",
+    "model": "",
+    "connection": ""
+}
+
+# Number of threads loading model images for all printers
+modelWorkerCount = 2
+
+# Delay before the first reconnect attempt of a printer; it doubles with every failed attempt up to reconnectMaxDelay (seconds)
+reconnectDelay = 5
+reconnectMaxDelay = 120
+
+# Share of the reconnect delay which is randomized, so printers which lost the connection together do not retry in lockstep
+reconnectJitter = 0.25
+
+# Failed reconnect attempts in a row after which the circuit opens; the printer is then only probed every circuitOpenDelay (seconds)
+circuitBreakerThreshold = 6
+circuitOpenDelay = 300
+
+# Interval of the MQTT keep-alive and timeout handling in real-time mode (seconds)
+mqttMiscInterval = 1
+
+# Last value written to each source setting, keyed by (source name, setting name)
+renderedValues = {}
+
+# Counters of the report pipeline since START; times are summed up in seconds
+metrics = {
+    "messagesReceived": 0, # MQTT messages received from the printers
+    "messagesDecoded": 0, # Messages decoded as print reports
+    "messagesDropped": 0, # Messages without a print report or with invalid JSON
+    "decodeSeconds": 0.0,
+    "reportsMerged": 0, # Reports which changed the printer state; reports merged between two redraws are coalesced
+    "redraws": 0, # Redraws rendering the merged reports
+    "renderSeconds": 0.0,
+    "updatesApplied": 0, # OBS source updates applied
+    "updatesSkipped": 0, # OBS source updates skipped because the value was already shown
+    "ftpTransfers": 0,
+    "ftpBytes": 0,
+    "ftpSeconds": 0.0,
+    "reconnects": 0 # Reconnect attempts of all printers
+}
+
+# Serializes the metric updates of the model image workers
+metricsLock = threading.Lock()
+
+# Interval of updating the metrics source and file (seconds)
+metricsInterval = 2
+
+# Records the duration of each pipeline stage in profileEvents if set
+profilingEnabled = False
+
+# Maximum number of recorded stages; the oldest stages are dropped first (about 15 minutes of one busy printer)
+profileBufferSize = 100000
+
+# Ring buffer of the recorded stages as tuples of name, start, duration (seconds), thread id and printer name
+profileEvents = collections.deque(maxlen=profileBufferSize)
+
+# Names, types and help texts of the metrics in the Prometheus text format
+prometheusMetrics = {
+    "messagesReceived": ("bambulab_messages_received_total", "counter", "MQTT messages received from the printers"),
+    "messagesDecoded": ("bambulab_messages_decoded_total", "counter", "Messages decoded as print reports"),
+    "messagesDropped": ("bambulab_messages_dropped_total", "counter", "Messages without a print report or with invalid JSON"),
+    "decodeSeconds": ("bambulab_decode_seconds_total", "counter", "Time spent decoding the reports"),
+    "reportsMerged": ("bambulab_reports_merged_total", "counter", "Reports which changed the printer state"),
+    "redraws": ("bambulab_redraws_total", "counter", "Redraws rendering the merged reports"),
+    "renderSeconds": ("bambulab_render_seconds_total", "counter", "Time spent rendering the reports"),
+    "updatesApplied": ("bambulab_obs_updates_applied_total", "counter", "OBS source updates applied"),
+    "updatesSkipped": ("bambulab_obs_updates_skipped_total", "counter", "OBS source updates skipped because the value was already shown"),
+    "ftpTransfers": ("bambulab_ftp_transfers_total", "counter", "Model image transfers via FTP"),
+    "ftpBytes": ("bambulab_ftp_bytes_total", "counter", "Bytes transferred via FTP"),
+    "ftpSeconds": ("bambulab_ftp_seconds_total", "counter", "Duration of the FTP transfers"),
+    "reconnects": ("bambulab_reconnects_total", "counter", "Reconnect attempts of all printers"),
+    "tlsHandshakes": ("bambulab_tls_handshakes_total", "counter", "TLS handshakes of the MQTT and FTPS connections"),
+    "tlsResumed": ("bambulab_tls_resumed_total", "counter", "TLS handshakes which resumed an earlier session"),
+    "mqttQueueDepth": ("bambulab_mqtt_queue_depth", "gauge", "MQTT packets waiting to be sent"),
+    "pendingUpdates": ("bambulab_obs_updates_pending", "gauge", "OBS source updates waiting for the OBS main thread"),
+    "connectedPrinters": ("bambulab_printers_connected", "gauge", "Printers connected to their MQTT broker")
+}
+
+# Source updates waiting to be applied on the OBS main thread, keyed by (source name, setting name)
+pendingUpdates = {}
+pendingUpdatesLock = threading.Lock()
+
+# Interval of the OBS timer applying the pending source updates (milliseconds, about one frame at 60 fps)
+sourceUpdateInterval = 16
+
+# Held references of the sources updated by the script, keyed by source name; None if there is no such source
+sourceHandles = {}
+sourceHandlesLock = threading.Lock()
+sourceHandlesGeneration = 0 # Incremented whenever a source is created, removed or renamed
+
+# Settings objects reused for the source updates, keyed by (source name, setting name); each only holds that setting
+sourceSettings = {}
+
+# OBS signals invalidating the cached source references
+sourceSignals = ("source_create", "source_remove", "source_destroy", "source_rename")
+
+# Report keys each text source is rendered from
+sourceFields = {
+    "nozzleType": ("nozzle_type", "nozzle_diameter"),
+    "nozzleTemp": ("nozzle_temper", "nozzle_target_temper"),
+    "bedTemp": ("bed_temper", "bed_target_temper"),
+    "chamberTemp": ("chamber_temper",),
+    "remainingTime": ("mc_remaining_time",),
+    "layer": ("layer_num", "total_layer_num"),
+    "filament": ("ams", "vt_tray"),
+    "filamentColor": ("ams", "vt_tray"),
+    "percentFinish": ("mc_percent",)
+}
+
+# Trays of one AMS unit; tray_now counts the trays of all units (unit * 4 + slot)
+traysPerAmsUnit = 4
+
+# tray_now of the external spool holder
+externalTrayId = "254"
+
+# Report keys needed to load the model image of a print task
+modelFields = ("task_id", "subtask_name", "print_type", "gcode_file")
+
+"""
+Selects the JSON decoder for the printer reports.
+orjson is preferred over ujson; the standard library is the fallback. All of them decode the payload bytes
+directly and raise a ValueError for invalid JSON.
+
+Returns:
+    tuple: The decode function and the name of the decoder.
+"""
+def selectJsonDecoder():
+    if orjson is not None:
+        return orjson.loads, "orjson"
+    if ujson is not None:
+        return ujson.loads, "ujson"
+    return json.loads, "json"
+
+
+decodeJson, jsonDecoderName = selectJsonDecoder()
+
+# Reports without this key (e.g. info or system messages) are dropped before decoding them
+printReportKey = b'"print"'
+
+"""
+Creates the registry entry of a printer.
+Every printer has its own MQTT connection, merged state, model image requests and source mapping.
+
+Args:
+    name (str): The name of the printer used in the log.
+    host (str): The host address of the printer.
+    serialNumber (str): The serial number of the printer.
+    secret (str): The access code of the printer.
+    sources (dict): The source names of the printer with the same keys as sourcesName.
+    certificateFingerprint (str): The pinned SHA-256 fingerprint of the certificate of the printer or an empty string.
+
+Returns:
+    dict: The printer.
+"""
+def createPrinter(name, host, serialNumber, secret, sources, certificateFingerprint=""):
+    return {
+        "name": name,
+        "host": host,
+        "serialNumber": serialNumber,
+        "secret": secret,
+        "certificateFingerprint": certificateFingerprint,
+        "tlsContexts": None, # TlsContextManager reused by all MQTT and FTPS connections of the printer
+        "sources": sources,
+        "reportKeys": getReportKeys(sources), # Report keys needed by the sources, updated by script_update()
+        "mqttClient": None, # MQTT client
+        "stopped": False, # Set if the printer rejected the access code
+        "reconnectTask": None, # Engine task reconnecting the printer
+        "reconnectAttempts": 0, # Failed connection attempts since the last successful connection
+        "connectionState": "disconnected", # Connection state shown in the connection status source, see connectionStateTexts
+        "taskId": "", # Task id
+        "printerState": {}, # Merged view of all print reports received since connecting
+        "changedKeys": set(), # Report keys changed since the last redraw
+        "amsIndex": {}, # Trays of all AMS units by global tray id, see updateAmsIndex()
+        "modelTask": None, # Engine task loading the model image
+        "modelGeneration": 0, # Incremented with every model image request; older downloads cancel themselves
+        "modelLock": threading.Lock(), # Held by the model image worker loading an image of this printer
+        "ftpSession": None # FtpSessionManager kept open between the model image downloads
+    }
+
+
+"""
+Checks if a source name refers to a source.
+
+Args:
+    sourceName (str): The name of the source.
+
+Returns:
+    bool: True unless the source is not set.
+"""
+def isSourceBound(sourceName):
+    return sourceName != "" and sourceName != "[No source]"
+
+
+"""
+Computes the report keys needed by the bound sources of a printer.
+Only these keys are merged into the printer state; the rest of each report is ignored.
+
+Args:
+    sources (dict): The source names of the printer with the same keys as sourcesName.
+
+Returns:
+    frozenset: The report keys.
+"""
+def getReportKeys(sources):
+    reportKeys = set()
+
+    for sourceKey, fields in sourceFields.items():
+        if isSourceBound(sources[sourceKey]):
+            reportKeys.update(fields)
+
+    if isSourceBound(sources["model"]):
+        reportKeys.update(modelFields)
+
+    return frozenset(reportKeys)
+
+
+"""
+Reads the additional printers from a JSON file.
+The file contains a list of printers with the keys name, host, accessCode, serialNumber,
+the optional certificateFingerprint and sources, which maps the keys of sourcesName to source names.
+
+Args:
+    printersFile (str): The path of the JSON file.
+
+Returns:
+    list: The printers.
+"""
+def loadPrinterFile(printersFile):
+    try:
+        with open(printersFile, 'r', encoding='utf-8') as printerFile:
+            printerConfigs = json.load(printerFile)
+    except (OSError, ValueError) as e:
+        log("Error reading printer file:", e)
+        return []
+
+    if not isinstance(printerConfigs, list):
+        log("Error reading printer file: the file must contain a list of printers")
+        return []
+
+    printers = []
+    for index, printerConfig in enumerate(printerConfigs):
+        if not isinstance(printerConfig, dict):
+            log(f"Printer {index + 1} in the printer file is no JSON object")
+            continue
+
+        host = printerConfig.get("host", "")
+        serialNumber = printerConfig.get("serialNumber", "")
+        secret = printerConfig.get("accessCode", "")
+        if not host or not serialNumber or not secret:
+            log(f"Printer {index + 1} in the printer file is missing host, accessCode or serialNumber")
+            continue
+
+        sources = printerConfig.get("sources", {})
+        if not isinstance(sources, dict):
+            log(f"The sources of printer {index + 1} in the printer file are no JSON object")
+            sources = {}
+
+        printers.append(createPrinter(printerConfig.get("name", serialNumber), host, serialNumber, secret,
+                                      {key: sources.get(key, "") for key in sourcesName},
+                                      printerConfig.get("certificateFingerprint", "")))
+
+    return printers
+
+
+"""
+Returns the description of the script.
+"""
+def script_description():
+    return "Read status data from a BambuLab X1C\n\nBy Mia Sophie Behrendt\nMaker-Hub.de"
+
+
+"""
+Updates the text source with the given text.
+
+Args:
+    source_name (str): The name of the text source.
+    text (str): The text to update the source with.
+"""
+def update_text_source(source_name, text):
+    source_obj = getSourceHandle(source_name)
+    if source_obj:
+        settings = getSourceSettings(source_name, "text")
+        obs.obs_data_set_string(settings, "text", text)
+        obs.obs_source_update(source_obj, settings)
+
+
+"""
+Formats the remaining time.
+
+Args:
+    mc_remaining_time (int): The remaining time in minutes.
+
+Returns:
+    str: The formatted remaining time.
+"""
+def formatTime(remainingTime):
+     global singularMinute
+     global singularHour
+     global pluralMinute
+     global pluralHour
+
+     # Überprüfe, ob mc_remaining_time eine Zeichenkette ist und versuche sie in eine Ganzzahl umzuwandeln
+     if isinstance(remainingTime, str):
+          try:
+               remainingTime = int(remainingTime)
+          except ValueError:
+               return "0 " + pluralMinute
+
+     # Stelle sicher, dass mc_remaining_time eine positive Ganzzahl ist
+     if remainingTime < 0:
+          return "0 " + pluralMinute
+
+     # Umrechnung von Minuten in Stunden und Minuten
+     hours = remainingTime // 60
+     minutes = remainingTime % 60
+    
+     # Erstellung der formatierten Zeitangabe
+     formattedTime = ""
+     if hours > 0:
+          formattedTime += f"{hours} {singularHour if hours == 1 else pluralHour} "
+     formattedTime += f"{minutes} {singularMinute if minutes == 1 else pluralMinute}"
+    
+     return formattedTime
+
+
+"""
+Checks if a value is already shown by a source and counts the update as skipped if so.
+
+Args:
+    sourceName (str): The name of the source.
+    settingName (str): The name of the source setting.
+    value: The value to set.
+
+Returns:
+    bool: True if the value is already shown and the update can be skipped.
+"""
+def isValueRendered(sourceName, settingName, value):
+    global renderedValues
+    global metrics
+
+    # Image files may have been rewritten under the same name, so they are always reloaded
+    if settingName == "file":
+        return False
+
+    if renderedValues.get((sourceName, settingName), None) != value:
+        return False
+
+    metrics["updatesSkipped"] += 1
+    return True
+
+
+"""
+Remembers a value written to a source and counts the update as applied.
+
+Args:
+    sourceName (str): The name of the source.
+    settingName (str): The name of the source setting.
+    value: The value that was set.
+"""
+def setValueRendered(sourceName, settingName, value):
+    global renderedValues
+    global metrics
+
+    renderedValues[(sourceName, settingName)] = value
+    metrics["updatesApplied"] += 1
+
+
+"""
+Resets the cache of rendered values.
+"""
+def resetRenderedValues():
+    global renderedValues
+
+    renderedValues.clear()
+
+
+"""
+Forgets the rendered values of sources whose held references were invalidated and queues them again.
+A source created or renamed under the name does not show them yet, so they must not be skipped as already rendered.
+May be called on any thread.
+
+Args:
+    sourceNames: The names of the sources.
+"""
+def invalidateRenderedValues(sourceNames):
+    global renderedValues
+    global pendingUpdates
+
+    sourceNames = set(sourceNames)
+
+    with pendingUpdatesLock:
+        for key in list(renderedValues):
+            if key[0] not in sourceNames:
+                continue
+
+            value = renderedValues.pop(key, None)
+            # A newer value waiting to be applied is kept
+            if value is not None:
+                pendingUpdates.setdefault(key, value)
+
+
+"""
+Resets all metrics to zero.
+"""
+def resetMetrics():
+    global metrics
+
+    for key in metrics:
+        metrics[key] = 0
+
+
+"""
+Adds values to metrics which are updated by the model image workers.
+
+Args:
+    **values: The values keyed by metric.
+"""
+def addMetrics(**values):
+    global metrics
+
+    with metricsLock:
+        for key, value in values.items():
+            metrics[key] += value
+
+
+"""
+Gets the current metrics including the gauges of the printers.
+
+Returns:
+    dict: The metrics with the same keys as prometheusMetrics.
+"""
+def getMetrics():
+    currentMetrics = dict(metrics)
+    printers = environment["printers"]
+
+    # paho keeps the packets which are not sent yet in a private queue
+    currentMetrics["mqttQueueDepth"] = sum(len(getattr(printer["mqttClient"], "_out_packet", ()))
+                                           for printer in printers if printer["mqttClient"] is not None)
+    currentMetrics["pendingUpdates"] = len(pendingUpdates)
+    currentMetrics["connectedPrinters"] = sum(1 for printer in printers if printer["connectionState"] == "connected")
+
+    # The TLS contexts of the printers count their handshakes
+    contexts = [context for printer in printers if printer["tlsContexts"] is not None for context in printer["tlsContexts"].contexts()]
+    currentMetrics["tlsHandshakes"] = sum(context.handshakes for context in contexts)
+    currentMetrics["tlsResumed"] = sum(context.resumedHandshakes for context in contexts)
+    return currentMetrics
+
+
+"""
+Formats the metrics in the Prometheus text format.
+
+Args:
+    currentMetrics (dict): The metrics, see getMetrics().
+
+Returns:
+    str: The metrics.
+"""
+def formatMetricsPrometheus(currentMetrics):
+    lines = []
+    for key, (name, metricType, helpText) in prometheusMetrics.items():
+        lines.append(f"# HELP {name} {helpText}")
+        lines.append(f"# TYPE {name} {metricType}")
+        lines.append(f"{name} {currentMetrics[key]}")
+    return "\n".join(lines) + "\n"
+
+
+"""
+Formats the metrics as text for the metrics source.
+Rates are calculated from the difference to the previous metrics.
+
+Args:
+    currentMetrics (dict): The metrics, see getMetrics().
+    previousMetrics (dict): The metrics of the previous update.
+    elapsed (float): Seconds since the previous update.
+
+Returns:
+    str: The text.
+"""
+def formatMetricsText(currentMetrics, previousMetrics, elapsed):
+    def rate(key):
+        return (currentMetrics[key] - previousMetrics.get(key, 0)) / elapsed if elapsed > 0 else 0
+
+    def average(secondsKey, countKey):
+        count = currentMetrics[countKey]
+        return currentMetrics[secondsKey] / count * 1000000 if count else 0
+
+    return "\n".join((
+        f'Messages: {rate("messagesReceived"):.1f}/s received, {rate("messagesDropped"):.1f}/s dropped, {rate("reportsMerged"):.1f}/s merged',
+        f'Decode: {average("decodeSeconds", "messagesDecoded"):.0f} µs/message, render: {average("renderSeconds", "redraws"):.0f} µs/redraw',
+        f'OBS updates: {currentMetrics["updatesApplied"]} applied, {currentMetrics["updatesSkipped"]} skipped, {currentMetrics["pendingUpdates"]} pending',
+        f'FTP: {currentMetrics["ftpTransfers"]} transfers, {currentMetrics["ftpBytes"] / 1024 / 1024:.1f} MB in {currentMetrics["ftpSeconds"]:.1f} s',
+        f'Printers connected: {currentMetrics["connectedPrinters"]}/{len(environment["printers"])}, '
+        f'reconnects: {currentMetrics["reconnects"]}, MQTT queue: {currentMetrics["mqttQueueDepth"]}',
+        f'TLS: {currentMetrics["tlsHandshakes"]} handshakes, {currentMetrics["tlsResumed"]} resumed'
+    ))
+
+
+"""
+Writes the metrics file in the Prometheus text format, e.g. for the textfile collector of the node exporter.
+The file is replaced atomically, so readers never see a partial file.
+
+Args:
+    metricsFile (str): The path of the file.
+    currentMetrics (dict): The metrics, see getMetrics().
+"""
+def writeMetricsFile(metricsFile, currentMetrics):
+    temporaryMetricsFile = metricsFile + ".part"
+    try:
+        with open(temporaryMetricsFile, 'w', encoding='utf-8') as outputMetricsFile:
+            outputMetricsFile.write(formatMetricsPrometheus(currentMetrics))
+        os.replace(temporaryMetricsFile, metricsFile)
+    except OSError as e:
+        log("Error writing metrics file:", e)
+
+
+"""
+Records the duration of a pipeline stage in the profiling ring buffer.
+Callers check profilingEnabled first, so there is no overhead while profiling is off.
+
+Args:
+    name (str): The name of the stage.
+    start (float): The start of the stage (time.perf_counter()).
+    end (float): The end of the stage (time.perf_counter()).
+    printer (dict): The printer the stage belongs to or None.
+"""
+def recordStage(name, start, end, printer=None):
+    # Appending to a deque is thread safe, so the model image workers record without a lock
+    profileEvents.append((name, start, end - start, threading.get_ident(), printer["name"] if printer is not None else None))
+
+
+"""
+Exports the recorded stages as Chrome trace event JSON, which can be opened in chrome://tracing or Perfetto.
+
+Args:
+    profileFile (str): The path of the file.
+
+Returns:
+    int: The number of exported stages.
+"""
+def exportProfile(profileFile):
+    events = list(profileEvents)
+    processId = os.getpid()
+    threadNames = {thread.ident: thread.name for thread in threading.enumerate()}
+
+    traceEvents = []
+    for threadId in sorted({event[3] for event in events}):
+        traceEvents.append({"name": "thread_name", "ph": "M", "pid": processId, "tid": threadId,
+                            "args": {"name": threadNames.get(threadId, f"Thread {threadId}")}})
+
+    for name, start, duration, threadId, printerName in events:
+        traceEvent = {"name": name, "cat": "pipeline", "ph": "X", "pid": processId, "tid": threadId,
+                      "ts": round(start * 1000000, 3), "dur": round(duration * 1000000, 3)}
+        if printerName is not None:
+            traceEvent["args"] = {"printer": printerName}
+        traceEvents.append(traceEvent)
+
+    with open(profileFile, 'w', encoding='utf-8') as outputProfileFile:
+        json.dump({"traceEvents": traceEvents, "displayTimeUnit": "ms"}, outputProfileFile)
+
+    return len(events)
+
+
+"""
+Gets the held reference of a source.
+The source is looked up by name only the first time; the reference is kept until the source is removed or renamed.
+Must be called on the OBS main thread.
+
+Args:
+    sourceName (str): The name of the source.
+
+Returns:
+    The source or None if there is no source with this name.
+"""
+def getSourceHandle(sourceName):
+    global sourceHandles
+
+    with sourceHandlesLock:
+        if sourceName in sourceHandles:
+            return sourceHandles[sourceName]
+        generation = sourceHandlesGeneration
+
+    # The lookup takes the OBS source mutex, so it must not be done while holding the lock
+    source = obs.obs_get_source_by_name(sourceName)
+
+    with sourceHandlesLock:
+        if generation == sourceHandlesGeneration and sourceName not in sourceHandles:
+            sourceHandles[sourceName] = source
+            return source
+
+    # Sources changed during the lookup; the reference is not cached
+    if source is not None:
+        obs.obs_source_release(source)
+    return getSourceHandle(sourceName)
+
+
+"""
+Releases the held references of the given sources, or of all sources.
+
+Args:
+    sourceNames: The names of the sources or None to release all references.
+"""
+def releaseSourceHandles(sourceNames=None):
+    global sourceHandles
+    global sourceHandlesGeneration
+
+    with sourceHandlesLock:
+        sourceHandlesGeneration += 1
+
+        if sourceNames is None:
+            sourceNames = list(sourceHandles)
+        sources = [sourceHandles.pop(sourceName, None) for sourceName in sourceNames]
+
+    invalidateRenderedValues(sourceNames)
+
+    # Releasing the last reference destroys the source, which emits a signal handled by onSourceSignal()
+    for source in sources:
+        if source is not None:
+            obs.obs_source_release(source)
+
+
+"""
+Looks up the bound sources of all printers and holds references to them.
+Must be called on the OBS main thread.
+"""
+def resolveSourceHandles():
+    releaseSourceHandles()
+
+    sourceNames = set(sourcesName.values())
+    sourceNames.add(environment["metricsSource"])
+    for printer in environment["printers"]:
+        sourceNames.update(printer["sources"].values())
+
+    for sourceName in sourceNames:
+        if isSourceBound(sourceName):
+            getSourceHandle(sourceName)
+
+
+"""
+Signal callback invalidating the held references when a source is created, removed, destroyed or renamed.
+May be called on any thread.
+
+Args:
+    calldata: The calldata of the signal.
+"""
+def onSourceSignal(calldata):
+    prevName = obs.calldata_string(calldata, "prev_name")
+
+    if prevName:
+        releaseSourceHandles([prevName, obs.calldata_string(calldata, "new_name")])
+    else:
+        releaseSourceHandles([obs.obs_source_get_name(obs.calldata_source(calldata, "source"))])
+
+
+"""
+Connects or disconnects the signals invalidating the held source references.
+
+Args:
+    connect (bool): True to connect, False to disconnect the signals.
+"""
+def connectSourceSignals(connect):
+    signalHandler = obs.obs_get_signal_handler()
+
+    for signal in sourceSignals:
+        if connect:
+            obs.signal_handler_connect(signalHandler, signal, onSourceSignal)
+        else:
+            obs.signal_handler_disconnect(signalHandler, signal, onSourceSignal)
+
+
+"""
+Gets the settings object reused for the updates of a source setting.
+It only holds this setting, so updating a source with it leaves the other settings of the source untouched.
+Must be called on the OBS main thread.
+
+Args:
+    sourceName (str): The name of the source.
+    settingName (str): The name of the source setting.
+
+Returns:
+    The settings object.
+"""
+def getSourceSettings(sourceName, settingName):
+    global sourceSettings
+
+    settings = sourceSettings.get((sourceName, settingName), None)
+    if settings is None:
+        settings = obs.obs_data_create()
+        sourceSettings[(sourceName, settingName)] = settings
+
+    return settings
+
+
+"""
+Releases the reused settings objects.
+Must be called on the OBS main thread.
+"""
+def releaseSourceSettings():
+    global sourceSettings
+
+    for settings in sourceSettings.values():
+        obs.obs_data_release(settings)
+    sourceSettings.clear()
+
+
+"""
+Queues an update of a source setting to be applied on the OBS main thread.
+A queued update replaces an older update of the same source setting which has not been applied yet.
+
+Args:
+    sourceName (str): The name of the source.
+    settingName (str): The name of the source setting ("text", "color" or "file").
+    value: The value to set.
+"""
+def queueSourceUpdate(sourceName, settingName, value):
+    global pendingUpdates
+
+    with pendingUpdatesLock:
+        pendingUpdates[(sourceName, settingName)] = value
+
+
+"""
+Applies an update of a source setting.
+Must be called on the OBS main thread.
+
+Args:
+    sourceName (str): The name of the source.
+    settingName (str): The name of the source setting ("text", "color" or "file").
+    value: The value to set.
+"""
+def applySourceUpdate(sourceName, settingName, value):
+    if isValueRendered(sourceName, settingName, value):
+        return
+
+    sourceField = getSourceHandle(sourceName)
+    if sourceField is None:
+        return
+
+    # The settings object only holds this setting, so the update does not touch the other settings of the source
+    settings = getSourceSettings(sourceName, settingName)
+    if settingName == "color":
+        obs.obs_data_set_int(settings, "color", value) 
+    else:
+        obs.obs_data_set_string(settings, settingName, value)
+
+    obs.obs_source_update(sourceField, settings)
+    setValueRendered(sourceName, settingName, value)
+
+
+"""
+Timer callback applying all pending source updates in one batch on the OBS main thread.
+"""
+def applySourceUpdates():
+    global pendingUpdates
+
+    with pendingUpdatesLock:
+        if not pendingUpdates:
+            return
+
+        updates = pendingUpdates
+        pendingUpdates = {}
+
+    with ProfileStage("obsUpdates"):
+        for (sourceName, settingName), value in updates.items():
+            applySourceUpdate(sourceName, settingName, value)
+
+
+"""
+Sets the color for a given source.
+
+Args:
+    source_name (str): The name of the source.
+    color (int): The color to set.
+"""
+def set_color(source_name, color):
+    queueSourceUpdate(source_name, "color", color)
+
+
+"""
+Sets the value for a given source.
+
+Args:
+    sourceName (str): The name of the source.
+    value (str): The value to set.
+"""
+def setSourceValue(sourceName, value):
+    if not isSourceBound(sourceName):
+        return
+
+    queueSourceUpdate(sourceName, "text", value)
+
+
+"""
+Gets the plate key from the given value.
+
+Args:
+    value (str): The value to get the key for.
+
+Returns:
+    str: The plate key.
+"""
+def get_plate_key_from_value(value):
+    if value == "Bambu Cool Plate":
+        return "BambuCoolPlate.png"
+    elif value == "Bambu Engineering Plate":
+        return "BambuEngineeringPlate.png"
+    elif value == "Bambu High Temperature Plate (PEI)":
+        return "BambuSmoothPEIPlateHighTempPlate.png"
+    elif value == "Bambu Dual-Sided Smooth PEI Plate":
+        return "BambuSmoothPEIPlateHighTempPlate.png"
+    elif value == "Bambu Textured PEI Plate":
+        return "BambuTexturedPEIPlate.png"
+    else:
+        return None
+
+"""
+Checks if a model image request has been superseded and aborts it if so.
+
+Args:
+    printer (dict): The printer.
+    generation (int): The generation of the model image request.
+"""
+def checkModelImageCancelled(printer, generation):
+    if generation != printer["modelGeneration"]:
+        raise ftpTransfer.ModelImageCancelled()
+
+
+"""
+Reads a single entry of a remote 3mf file without transferring the whole file.
+The zip central directory is read from the end of the file and only the byte range of the entry is transferred.
+
+Args:
+    printer (dict): The printer.
+    ftpClient (ImplicitFTP_TLS): The logged in ftp client.
+    modelFileName (str): The path of the 3mf file on the printer.
+    desiredImage (str): The name of the entry in the 3mf file.
+    generation (int): The generation of the model image request.
+
+Returns:
+    bytes: The content of the entry or None if the server does not support partial transfers or the file is no zip file.
+
+Raises:
+    KeyError: If the entry does not exist in the 3mf file.
+    OSError, EOFError: If the ftp session is lost; the download is then retried on a new session.
+"""
+def readModelImagePartial(printer, ftpClient, modelFileName, desiredImage, generation):
+    modelFile = None
+    try:
+        modelFile = ftpTransfer.FtpRangeReader(ftpClient, modelFileName, checkCancelled=lambda: checkModelImageCancelled(printer, generation))
+        with zipfile.ZipFile(modelFile, 'r') as modelZipObject:
+            imageFileBinary = modelZipObject.read(desiredImage)
+
+    # Only a missing SIZE/REST support or a broken file is worked around; a lost session must reach FtpSessionManager.run()
+    except (ftplib.error_perm, ftplib.error_reply, zipfile.BadZipFile) as e:
+        log("Partial model download not possible, loading the whole file:", e)
+        return None
+    finally:
+        if modelFile is not None:
+            addMetrics(ftpBytes=modelFile.bytesTransferred)
+
+    log(f"Model image loaded with {modelFile.bytesTransferred} of {modelFile.size} bytes transferred")
+    return imageFileBinary
+
+
+# Name of the index file of the model image cache mapping task ids to cached images
+modelCacheIndexFileName = "modelCache.json"
+
+# Cached model images are named by the sha1 of their cache key
+modelCacheFilePattern = re.compile(r"^[0-9a-f]{40}\.png$")
+
+# Serializes changes of the model image cache between the model image workers
+modelCacheLock = threading.Lock()
+
+
+"""
+Loads the index of the model image cache.
+
+Args:
+    cacheFolderPath (str): The folder of the model image cache.
+
+Returns:
+    dict: The task ids (prefixed with the serial number of the printer) mapped to the file names of their cached images.
+"""
+def loadModelCacheIndex(cacheFolderPath):
+    try:
+        with open(os.path.join(cacheFolderPath, modelCacheIndexFileName), 'r') as indexFile:
+            return json.load(indexFile)
+    except (OSError, ValueError):
+        return {}
+
+
+"""
+Stores a task id in the index of the model image cache.
+Entries whose images have been evicted are removed.
+
+Args:
+    cacheFolderPath (str): The folder of the model image cache.
+    taskKey (str): The task id prefixed with the serial number of the printer.
+    cacheFileName (str): The file name of the cached image.
+"""
+def saveModelCacheIndex(cacheFolderPath, taskKey, cacheFileName):
+    with modelCacheLock:
+        index = loadModelCacheIndex(cacheFolderPath)
+        index[taskKey] = cacheFileName
+        index = {key: value for key, value in index.items() if os.path.isfile(os.path.join(cacheFolderPath, value))}
+
+        try:
+            with open(os.path.join(cacheFolderPath, modelCacheIndexFileName), 'w') as indexFile:
+                json.dump(index, indexFile)
+        except OSError as e:
+            log("Error writing model image cache index:", e)
+
+
+"""
+Gets the cache file name of a model image.
+The key consists of the model, the plate and the size and modification time of the 3mf file on the printer.
+
+Args:
+    ftpClient (ImplicitFTP_TLS): The logged in ftp client.
+    modelFileName (str): The path of the 3mf file on the printer.
+    nodePrint (dict): Json node printer
+
+Returns:
+    str: The cache file name or None if the printer does not report the file size.
+
+Raises:
+    OSError, EOFError: If the ftp session is lost; the download is then retried on a new session.
+"""
+def getModelCacheFileName(ftpClient, modelFileName, nodePrint):
+    try:
+        ftpClient.voidcmd("TYPE I")
+        remoteSize = ftpClient.size(modelFileName)
+    except (ftplib.error_perm, ftplib.error_reply):
+        return None
+
+    if remoteSize is None:
+        return None
+
+    try:
+        remoteModified = ftpClient.sendcmd("MDTM " + modelFileName)[4:].strip()
+    except ftplib.error_perm:
+        remoteModified = ""
+
+    cacheKey = "\n".join((nodePrint.get("subtask_name", ""), nodePrint.get("gcode_file", ""), str(remoteSize), remoteModified))
+    return hashlib.sha1(cacheKey.encode("utf-8")).hexdigest() + ".png"
+
+
+"""
+Removes the least recently used model images until the cache fits into its maximum size.
+
+Args:
+    cacheFolderPath (str): The folder of the model image cache.
+    keepFileName (str): The file name of the image in use which is never removed.
+"""
+def evictModelCache(cacheFolderPath, keepFileName):
+    with modelCacheLock:
+        cacheFiles = []
+        for fileName in os.listdir(cacheFolderPath):
+            if not modelCacheFilePattern.match(fileName):
+                continue
+
+            fileStat = os.stat(os.path.join(cacheFolderPath, fileName))
+            cacheFiles.append((fileStat.st_mtime, fileStat.st_size, fileName))
+
+        cacheSize = sum(fileSize for _, fileSize, _ in cacheFiles)
+        maxCacheSize = environment["modelCacheSize"] * 1024 * 1024
+
+        # Used images are touched, so the oldest modification time is the least recently used image
+        for _, fileSize, fileName in sorted(cacheFiles):
+            if cacheSize <= maxCacheSize:
+                break
+            if fileName == keepFileName:
+                continue
+
+            try:
+                os.remove(os.path.join(cacheFolderPath, fileName))
+                cacheSize -= fileSize
+            except OSError as e:
+                log("Error removing cached model image:", e)
+
+
+"""
+Marks a cached model image as used and shows it.
+
+Args:
+    printer (dict): The printer.
+    cacheFolderPath (str): The folder of the model image cache.
+    cacheFileName (str): The file name of the cached image.
+    generation (int): The generation of the model image request.
+"""
+def useCachedModelImage(printer, cacheFolderPath, cacheFileName, generation):
+    modelImageFileName = os.path.join(cacheFolderPath, cacheFileName)
+    os.utime(modelImageFileName, None)
+
+    if generation == printer["modelGeneration"]:
+        queueSourceUpdate(printer["sources"]["model"], "file", modelImageFileName)
+
+
+"""
+Extracts an image from a downloaded 3mf file.
+The image is decompressed in chunks directly into the output file.
+
+Args:
+    modelZipBinary: The file object holding the 3mf file.
+    desiredImage (str): The name of the entry in the 3mf file.
+    outputImageFileName (str): The path of the output file.
+
+Returns:
+    bool: False if the download is no zip file or does not contain the image.
+"""
+def extractModelImage(modelZipBinary, desiredImage, outputImageFileName):
+    # Checking if the file is a zipfile
+    if not zipfile.is_zipfile(modelZipBinary):
+        return False
+
+    # Reset the file pointer to the beginning of the file
+    modelZipBinary.seek(0)
+
+    # Unpacking needed image from zip file
+    with zipfile.ZipFile(modelZipBinary, 'r') as modelZipObject:
+        if desiredImage not in modelZipObject.namelist():
+            return False
+
+        with modelZipObject.open(desiredImage) as imageFile, open(outputImageFileName, 'wb') as outputImageFile:
+            shutil.copyfileobj(imageFile, outputImageFile)
+
+    return True
+
+
+"""
+Gets the current model image from the printer via ftp
+
+Args:
+    printer (dict): The printer
+    nodePrint (array): Json node printer
+    generation (int): The generation of the model image request
+
+"""
+def getModelImage(printer, nodePrint, generation):
+    global environment
+
+    modelSourceName = printer["sources"]["model"]
+    if not environment["imageFolderPath"] or not isSourceBound(modelSourceName):
+        return
+
+    imageFolderPath = os.path.join(environment["imageFolderPath"], "model")
+
+    # Getting current model file name
+    modelFileName = nodePrint.get("subtask_name", "")
+    if not modelFileName:
+        return
+
+    # Getting operation mode
+    printType  = nodePrint.get("print_type", "")
+
+    if printType == "cloud" or printType == "local":
+        modelFileName += ".3mf"
+        modelFileName = "cache/" + modelFileName
+    else:
+        modelFileName += ".gcode.3mf"
+
+    # Getting current plate which represents the image file
+    modelImageFileName = nodePrint.get("gcode_file", "")
+    if not modelImageFileName:
+        return
+
+    # Known tasks are shown from the cache without connecting to the printer
+    # LAN only prints may all report the task id 0, so it does not identify a task there
+    taskId = nodePrint.get("task_id", "")
+    taskKey = printer["serialNumber"] + "/" + taskId if taskId and taskId != "0" else None
+    with ProfileStage("modelCacheLookup", printer):
+        cacheFileName = loadModelCacheIndex(imageFolderPath).get(taskKey, None) if taskKey else None
+    if cacheFileName and os.path.isfile(os.path.join(imageFolderPath, cacheFileName)):
+        log("Model image loaded from cache")
+        useCachedModelImage(printer, imageFolderPath, cacheFileName, generation)
+        return
+
+    log("Loading model image")
+
+    modelImageFileName = os.path.basename(modelImageFileName)
+    modelImageFileName = os.path.splitext(modelImageFileName)[0]
+    modelImageFileName += ".png"
+
+    desiredImage = "Metadata/" + modelImageFileName
+
+    # Downloads are kept in memory up to the threshold and written to a temporary file beyond it
+    with tempfile.SpooledTemporaryFile(max_size=environment["modelSpoolThreshold"] * 1024 * 1024) as modelZipBinary:
+
+        # Writes a received block and stops the transfer if a newer model image was requested
+        def writeBlock(block):
+            checkModelImageCancelled(printer, generation)
+            modelZipBinary.write(block)
+            addMetrics(ftpBytes=len(block))
+
+        # Transfers the model image; may be repeated on a new session if the kept session was broken
+        def transferModelImage(ftpClient):
+            modelZipBinary.seek(0)
+            modelZipBinary.truncate()
+
+            # Same model file and plate as an earlier task
+            cacheFileName = getModelCacheFileName(ftpClient, modelFileName, nodePrint)
+            if cacheFileName and os.path.isfile(os.path.join(imageFolderPath, cacheFileName)):
+                return cacheFileName, None, True
+
+            imageFileBinary = None
+            if environment["partialModelDownload"]:
+                imageFileBinary = readModelImagePartial(printer, ftpClient, modelFileName, desiredImage, generation)
+
+            if imageFileBinary is None:
+                ftpClient.retrbinary('RETR ' + modelFileName, writeBlock)
+
+            return cacheFileName, imageFileBinary, False
+
+        # Use the implicit ftp connection via TLS connection kept by the session manager
+        transferStart = time.perf_counter()
+        try:
+            with ProfileStage("ftpTransfer", printer):
+                cacheFileName, imageFileBinary, cached = printer["ftpSession"].run(transferModelImage)
+
+        except ftpTransfer.ModelImageCancelled:
+            log("Model image download cancelled")
+            return
+        except KeyError:
+            return  # Image not found in the zip file
+        except ConnectionError:
+            log("Error establishing FTP connection:")
+            return
+        except PermissionError:
+            log("Failed to authenticate. Check your username and password.")
+            return
+        except Exception as e:
+            log("ftp error:", e)
+            return
+        finally:
+            addMetrics(ftpTransfers=1, ftpSeconds=time.perf_counter() - transferStart)
+
+        if cached:
+            log("Model image loaded from cache")
+            if taskKey:
+                saveModelCacheIndex(imageFolderPath, taskKey, cacheFileName)
+            useCachedModelImage(printer, imageFolderPath, cacheFileName, generation)
+            return
+
+        # Checking if the file already exists and creating if not so
+        os.makedirs(imageFolderPath, exist_ok=True)
+
+        # Save the image data to the desired directory
+        if cacheFileName:
+            modelImageFileName = cacheFileName
+        modelImageFileName = os.path.join(imageFolderPath, modelImageFileName)
+
+        # The image is written under a temporary name first, so OBS and the cache never see a partial file
+        temporaryImageFileName = modelImageFileName + ".part"
+
+        with ProfileStage("extractImage", printer):
+            if imageFileBinary is not None:
+                with open(temporaryImageFileName, 'wb') as outputImageFile:
+                    outputImageFile.write(imageFileBinary)
+            elif not extractModelImage(modelZipBinary, desiredImage, temporaryImageFileName):
+                return  # Image not found in the zip file
+
+    os.replace(temporaryImageFileName, modelImageFileName)
+
+    if cacheFileName:
+        evictModelCache(imageFolderPath, cacheFileName)
+        if taskKey:
+            saveModelCacheIndex(imageFolderPath, taskKey, cacheFileName)
+
+    # Setting model image path to the image source unless a newer task is loading already
+    if generation == printer["modelGeneration"]:
+        queueSourceUpdate(modelSourceName, "file", modelImageFileName)
+
+
+"""
+Requests loading the model image of a print task in the background.
+A download still running for a previous task of the same printer is cancelled.
+Must be called on the engine thread.
+
+Args:
+    printer (dict): The printer
+    nodePrint (dict): Json node printer
+"""
+def requestModelImage(printer, nodePrint):
+    printer["modelGeneration"] += 1
+
+    if printer["modelTask"] is not None:
+        printer["modelTask"].cancel()
+
+    # Only the fields needed for the download are passed, the printer state keeps changing
+    modelRequest = {key: nodePrint.get(key, "") for key in modelFields}
+    printer["modelTask"] = startEngineTask(loadModelImage(printer, modelRequest, printer["modelGeneration"]))
+
+
+"""
+Engine task loading a model image.
+The blocking ftp transfer runs in the model image executor; the event loop keeps servicing the printers.
+
+Args:
+    printer (dict): The printer
+    nodePrint (dict): The fields of the json node printer needed for the download
+    generation (int): The generation of the model image request
+"""
+async def loadModelImage(printer, nodePrint, generation):
+    await asyncio.get_event_loop().run_in_executor(environment["modelExecutor"], runModelImageRequest, printer, nodePrint, generation)
+
+
+"""
+Loads a model image unless a newer one has been requested for the printer in the meantime.
+Runs in the model image executor.
+
+Args:
+    printer (dict): The printer
+    nodePrint (dict): The fields of the json node printer needed for the download
+    generation (int): The generation of the model image request
+"""
+def runModelImageRequest(printer, nodePrint, generation):
+    global environment
+
+    # A cancelled download of the same printer releases the lock after its current block
+    with printer["modelLock"]:
+        if generation != printer["modelGeneration"]:
+            return  # A newer task has been requested in the meantime
+
+        if printer["ftpSession"] is None:
+            printer["ftpSession"] = ftpTransfer.FtpSessionManager(printer["host"], environment["ftpPort"], environment["user"], printer["secret"],
+                                                                  printer["tlsContexts"].ftpContext)
+
+        try:
+            with ProfileStage("modelImage", printer):
+                getModelImage(printer, nodePrint, generation)
+        except Exception as e:
+            log("Error loading model image:", e)
+
+
+"""
+Closes the ftp sessions of all printers once their downloads have finished.
+Runs in the model image executor.
+"""
+def closeFtpSessions():
+    for printer in environment["printers"]:
+        with printer["modelLock"]:
+            if printer["ftpSession"] is not None:
+                printer["ftpSession"].close()
+                printer["ftpSession"] = None
+
+
+"""
+Keeps the idle ftp sessions of all printers alive.
+Sessions currently used for a download are skipped.
+Runs in the model image executor.
+"""
+def keepFtpSessionsAlive():
+    for printer in environment["printers"]:
+        if not printer["modelLock"].acquire(blocking=False):
+            continue
+
+        try:
+            if printer["ftpSession"] is not None:
+                printer["ftpSession"].keepAlive()
+        finally:
+            printer["modelLock"].release()
+
+
+"""
+Merges a json node of a (partial) report into the stored node.
+Dictionaries are merged key by key and lists of nodes with an "id" (e.g. AMS units and trays) are merged by id.
+
+Args:
+    currentNode: The stored node.
+    deltaNode: The node received with the report.
+
+Returns:
+    tuple: The merged node and whether anything changed.
+"""
+def mergeNode(currentNode, deltaNode):
+    if isinstance(currentNode, dict) and isinstance(deltaNode, dict):
+        changed = False
+        for key, value in deltaNode.items():
+            mergedValue, valueChanged = mergeNode(currentNode.get(key), value)
+            if valueChanged:
+                currentNode[key] = mergedValue
+                changed = True
+        return currentNode, changed
+
+    if isinstance(currentNode, list) and isinstance(deltaNode, list) \
+        and all(isinstance(item, dict) and "id" in item for item in currentNode + deltaNode):
+        changed = False
+        currentItems = {item["id"]: item for item in currentNode}
+        for item in deltaNode:
+            currentItem = currentItems.get(item["id"], None)
+            if currentItem is None:
+                currentNode.append(item)
+                currentItems[item["id"]] = item
+                changed = True
+                continue
+
+            _, itemChanged = mergeNode(currentItem, item)
+            changed = changed or itemChanged
+        return currentNode, changed
+
+    return deltaNode, currentNode != deltaNode
+
+
+"""
+Merges the needed keys of a (partial) print report into the printer state.
+
+Args:
+    printerState (dict): The merged state of all previous reports.
+    nodePrint (dict): Json node printer of the received report.
+    reportKeys (frozenset): The report keys needed by the sources, see getReportKeys().
+
+Returns:
+    set: The top level report keys whose value changed.
+"""
+def mergeReport(printerState, nodePrint, reportKeys):
+    changedKeys = set()
+
+    for key in reportKeys:
+        if key not in nodePrint:
+            continue
+
+        mergedValue, changed = mergeNode(printerState.get(key), nodePrint[key])
+        if changed:
+            printerState[key] = mergedValue
+            changedKeys.add(key)
+
+    return changedKeys
+
+
+"""
+Checks if a source has to be redrawn because one of its report keys changed.
+
+Args:
+    sources (dict): The source names of the printer.
+    sourceKey (str): The key of the source in sourcesName.
+    changedKeys (set): The changed report keys or None if everything has to be redrawn.
+
+Returns:
+    bool: True if the source is bound and has to be redrawn.
+"""
+def isSourceChanged(sources, sourceKey, changedKeys):
+    if not isSourceBound(sources[sourceKey]):
+        return False
+
+    if changedKeys is None:
+        return True
+
+    return not changedKeys.isdisjoint(sourceFields[sourceKey])
+
+
+"""
+Updates the AMS index of a printer with the AMS units changed by a report.
+Only the units contained in the ams delta are indexed again, from their merged nodes.
+
+Args:
+    amsIndex (dict): The AMS index of the printer, see createPrinter().
+    nodeAms (dict): The merged json node ams.
+    deltaAms (dict): The json node ams received with the report.
+"""
+def updateAmsIndex(amsIndex, nodeAms, deltaAms):
+    deltaUnits = deltaAms.get("ams", None) if isinstance(deltaAms, dict) else None
+    if not isinstance(deltaUnits, list):
+        return
+
+    changedUnitIds = {unit.get("id", None) for unit in deltaUnits if isinstance(unit, dict)}
+
+    for unit in nodeAms.get("ams", ()):
+        if unit.get("id", None) not in changedUnitIds:
+            continue
+
+        try:
+            unitNumber = int(unit["id"])
+        except (TypeError, ValueError):
+            continue
+
+        for tray in unit.get("tray", ()):
+            try:
+                slot = int(tray["id"])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            # Global tray ids count the slots of all units, as reported in tray_now
+            amsIndex[str(unitNumber * traysPerAmsUnit + slot)] = {
+                "unit": unitNumber,
+                "slot": slot,
+                "type": tray.get("tray_type", ""),
+                "color": tray.get("tray_color", "") or "FFFFFF",
+                "remain": tray.get("remain", -1),
+                "humidity": unit.get("humidity", "")
+            }
+
+
+"""
+Gets the filament type and color of the active tray.
+AMS trays are looked up in the AMS index of the printer; the external spool is read from vt_tray.
+
+Args:
+    nodePrint (dict): Merged json node printer.
+    amsIndex (dict): The AMS index of the printer, see updateAmsIndex().
+
+Returns:
+    tuple: The filament type and the color as RRGGBBAA hex.
+"""
+def getTrayInformation(nodePrint, amsIndex):
+    # Der Tray-Index befindet sich in nodeAms
+    nodeAms = nodePrint.get("ams", None)
+
+    if nodeAms is None:
+        return "", "FFFFFF"
+
+    # Aktuellen Tray-Index abrufen
+    currentTrayId = nodeAms.get("tray_now", "")
+
+    # Externer Tray
+    if currentTrayId == externalTrayId:
+        nodeVtTray = nodePrint.get("vt_tray", None)
+
+        # Externer Tray-Knoten überprüfen
+        if nodeVtTray is None:
+            return "", "FFFFFF"
+
+        return nodeVtTray.get("tray_type", ""), nodeVtTray.get("tray_color", "")
+
+    # No tray is loaded (255) or the tray has not been reported yet
+    tray = amsIndex.get(currentTrayId, None)
+    if tray is None:
+        return "", "FFFFFF"
+
+    return tray["type"], tray["color"]
+
+
+"""
+Callback function for handling MQTT messages.
+The report is only merged into the printer state; the redraw timer renders the latest state once per tick,
+so several reports arriving between two redraws cost a single render pass.
+
+Args:
+    mqttClient: The mqtt client instance.
+    userdata: The user data.
+    msg: The MQTT message.
+"""
+def onMessage(mqttClient, userdata, msg):
+    global environment
+
+    # The printer the client belongs to is passed as user data
+    printer = userdata
+
+    # Read once, so the stages of a message are consistent if profiling is switched meanwhile
+    profile = profilingEnabled
+
+    metrics["messagesReceived"] += 1
+
+    # Searching the raw payload is much cheaper than decoding messages which are not shown anyway
+    if printReportKey not in msg.payload:
+        metrics["messagesDropped"] += 1
+        return
+
+    decodeStart = time.perf_counter()
+    try:
+        # Decode the JSON directly from the payload bytes
+        jsonData = decodeJson(msg.payload)
+    except ValueError:
+        # Im Fehlerfall, gib None zurück
+        metrics["messagesDropped"] += 1
+        return
+    finally:
+        decodeEnd = time.perf_counter()
+        metrics["decodeSeconds"] += decodeEnd - decodeStart
+        if profile:
+            recordStage("decode", decodeStart, decodeEnd, printer)
+
+    nodePrint =  jsonData.get("print", None)
+
+    if nodePrint is None:
+        metrics["messagesDropped"] += 1
+        return
+
+    metrics["messagesDecoded"] += 1
+
+    if profile:
+        mergeStart = time.perf_counter()
+
+    changedKeys = mergeReport(printer["printerState"], nodePrint, printer["reportKeys"])
+
+    if profile:
+        recordStage("merge", mergeStart, time.perf_counter(), printer)
+    if changedKeys:
+        printer["changedKeys"].update(changedKeys)
+        metrics["reportsMerged"] += 1
+
+        if "ams" in changedKeys:
+            updateAmsIndex(printer["amsIndex"], printer["printerState"]["ams"], nodePrint["ams"])
+
+
+"""
+Renders the printer state to the OBS sources of the printer.
+
+Args:
+    printer (dict): The printer
+    nodePrint (dict): Merged json node printer
+    changedKeys (set): The report keys changed since the last redraw or None to redraw everything
+"""
+def renderReport(printer, nodePrint, changedKeys=None):
+    sourcesName = printer["sources"]
+    profile = profilingEnabled
+
+    # Extrahiere die gewünschten Informationen aus der Nachricht
+    bedTargetTemper = nodePrint.get("bed_target_temper", 0)
+    bedTemper = nodePrint.get("bed_temper", 0)
+    chamberTemper = nodePrint.get("chamber_temper", 0)
+    mcPercent = nodePrint.get("mc_percent", 0)
+    mcRemainingTime = nodePrint.get("mc_remaining_time", 0)
+    nozzleType = nodePrint.get("nozzle_type", "")
+    nozzleDiameter = nodePrint.get("nozzle_diameter", "")
+    nozzleTargetTemper = nodePrint.get("nozzle_target_temper", 0)
+    nozzleTemper = nodePrint.get("nozzle_temper", 0)
+    totalLayerNum = nodePrint.get("total_layer_num", 0)
+    currentLayer = nodePrint.get("layer_num", 0)
+
+    currentTaskId = nodePrint.get("task_id", "")
+
+    if currentTaskId != printer["taskId"]:
+        printer["taskId"] = currentTaskId
+
+        if isSourceBound(sourcesName["model"]):
+            # Load Model image in the background
+            requestModelImage(printer, nodePrint)
+
+
+    # Getting tray information
+    if isSourceChanged(sourcesName, "filament", changedKeys) or isSourceChanged(sourcesName, "filamentColor", changedKeys):
+        if profile:
+            stageStart = time.perf_counter()
+
+        trayType, trayColor = getTrayInformation(nodePrint, printer["amsIndex"])
+
+        if profile:
+            recordStage("trayLookup", stageStart, time.perf_counter(), printer)
+
+    # Set text for nozzle type
+    if isSourceChanged(sourcesName, "nozzleType", changedKeys):
+        if nozzleType == "hardened_steel":
+            setSourceValue(sourcesName["nozzleType"], nozzleDiameter + " " + hardenedSteel)
+        elif nozzleType == "stainless_steel":
+            setSourceValue(sourcesName["nozzleType"], nozzleDiameter + " " + stainlessSteel)
+        else:
+            setSourceValue(sourcesName["nozzleType"], nozzleDiameter + " " + undefine)	
+
+    # Set text for nozzle temp
+    if isSourceChanged(sourcesName, "nozzleTemp", changedKeys):
+        setSourceValue(sourcesName["nozzleTemp"], f"{nozzleTemper}°C / {nozzleTargetTemper}°C")
+
+    # Set text for bed temp
+    if isSourceChanged(sourcesName, "bedTemp", changedKeys):
+        setSourceValue(sourcesName["bedTemp"], f"{bedTemper}°C / {bedTargetTemper}°C")
+
+    # Set text for chamber temp
+    if isSourceChanged(sourcesName, "chamberTemp", changedKeys):
+        setSourceValue(sourcesName["chamberTemp"], f"{chamberTemper}°C")
+
+    # Set text for remaining time
+    if isSourceChanged(sourcesName, "remainingTime", changedKeys):
+        if profile:
+            stageStart = time.perf_counter()
+
+        remainingTimeText = formatTime(mcRemainingTime)
+
+        if profile:
+            recordStage("formatTime", stageStart, time.perf_counter(), printer)
+
+        setSourceValue(sourcesName["remainingTime"], remainingTimeText)
+
+    # Set text for layer
+    if isSourceChanged(sourcesName, "layer", changedKeys):
+        setSourceValue(sourcesName["layer"], f"{currentLayer}  /  {totalLayerNum}")
+
+    # Set text for percent finish
+    if isSourceChanged(sourcesName, "percentFinish", changedKeys):
+        setSourceValue(sourcesName["percentFinish"], f"{mcPercent}%")
+
+    # Set text for filament
+    if isSourceChanged(sourcesName, "filament", changedKeys):
+        setSourceValue(sourcesName["filament"], trayType)
+
+    # Set backgrund color for filament color
+    if isSourceChanged(sourcesName, "filamentColor", changedKeys):
+        set_color(sourcesName["filamentColor"], int(trayColor[:2] + trayColor[4:6] + trayColor[2:4] + trayColor[6:8], 16))
+
+
+"""
+Renders the printer state if reports changed it since the last redraw.
+
+Args:
+    printer (dict): The printer
+"""
+def renderLatestReport(printer):
+    if not printer["changedKeys"]:
+        return
+
+    changedKeys = printer["changedKeys"]
+    printer["changedKeys"] = set()
+
+    renderStart = time.perf_counter()
+    renderReport(printer, printer["printerState"], changedKeys)
+    renderEnd = time.perf_counter()
+
+    metrics["renderSeconds"] += renderEnd - renderStart
+    metrics["redraws"] += 1
+    if profilingEnabled:
+        recordStage("render", renderStart, renderEnd, printer)
+
+
+"""
+Starts a task on the engine event loop and keeps track of it until it is done.
+Must be called on the engine thread.
+
+Args:
+    coroutine: The coroutine of the task.
+
+Returns:
+    asyncio.Task: The task.
+"""
+def startEngineTask(coroutine):
+    global environment
+
+    task = environment["eventLoop"].create_task(coroutine)
+    environment["engineTasks"].add(task)
+    task.add_done_callback(environment["engineTasks"].discard)
+    return task
+
+
+"""
+Calls a function on the engine thread.
+Paho calls the socket callbacks on the engine thread or, while connecting, in an executor thread.
+
+Args:
+    function: The function.
+    *args: The arguments of the function.
+"""
+def callOnEngine(function, *args):
+    if threading.current_thread() is environment["engineThread"]:
+        function(*args)
+        return
+
+    try:
+        environment["eventLoop"].call_soon_threadsafe(function, *args)
+    except RuntimeError:
+        pass  # The engine has been stopped while a connection attempt was running
+
+
+"""
+Loads the modules only needed while the printers are serviced.
+Called before the engine starts; the model image workers and the paho callbacks only run while the engine is running.
+Later calls return immediately.
+"""
+def loadEngineModules():
+    global asyncio, concurrent, ftplib, zipfile, tempfile, shutil, hashlib, pahoCompat, tlsContexts, ftpTransfer
+
+    if ftpTransfer is not None:
+        return
+
+    loadStart = time.perf_counter()
+
+    import asyncio
+    import concurrent.futures
+    import ftplib
+    import zipfile
+    import tempfile
+    import shutil
+    import hashlib
+    from . import pahoCompat
+    from . import tlsContexts
+
+    # Assigned last, it marks the modules as loaded
+    from . import ftpTransfer
+
+    log(f"Engine modules loaded in {(time.perf_counter() - loadStart) * 1000:.0f} ms")
+
+
+"""
+Starts the engine thread which runs the event loop servicing all printers.
+
+Args:
+    printers (list): The printers.
+"""
+def startEngine(printers):
+    global environment
+
+    try:
+        loadEngineModules()
+    except ImportError as e:
+        log("Error loading modules:", e)
+        return
+
+    # The TLS contexts are reused by all connections to a printer until the engine is started again
+    for printer in printers:
+        try:
+            printer["tlsContexts"] = tlsContexts.TlsContextManager(printer["name"], printer["certificateFingerprint"])
+        except ValueError as e:
+            log(f'Invalid certificate fingerprint of {printer["name"]}:', e)
+            return
+
+    # The MQTT clients are serviced in the mode chosen at START until the engine is started again
+    environment["engineRealtime"] = environment["realtime"]
+
+    # add_reader() is not available in the proactor event loop used by default on Windows
+    environment["eventLoop"] = asyncio.SelectorEventLoop()
+
+    # Created before the thread starts, so a STOP right after START always reaches this engine
+    environment["engineStopEvent"] = environment["eventLoop"].run_until_complete(createEngineStopEvent())
+    environment["modelExecutor"] = concurrent.futures.ThreadPoolExecutor(max_workers=modelWorkerCount)
+
+    environment["engineThread"] = threading.Thread(target=runEngine, args=(environment["eventLoop"], printers, environment["engineRealtime"]))
+    environment["engineThread"].daemon = True  # set the thread as a daemon so it will close when OBS closes
+    environment["engineThread"].start()
+    log("Engine started")
+
+
+"""
+Creates the event requesting the engine to stop.
+Runs on the event loop of the engine before its thread starts: before Python 3.10 an event is bound to the loop
+running when it is created, later versions bind it when it is first awaited.
+
+Returns:
+    asyncio.Event: The event.
+"""
+async def createEngineStopEvent():
+    return asyncio.Event()
+
+
+"""
+Requests the engine to stop.
+The running tasks are cancelled and the printers are disconnected on the engine thread.
+"""
+def stopEngine():
+    global environment
+
+    if environment["eventLoop"] is None or environment["engineStopEvent"] is None:
+        return
+
+    try:
+        environment["eventLoop"].call_soon_threadsafe(environment["engineStopEvent"].set)
+    except RuntimeError:
+        pass  # The event loop has already been closed
+
+
+"""
+Checks if the engine thread is running.
+
+Returns:
+    bool: True while the engine services the printers.
+"""
+def isEngineRunning():
+    return environment["engineThread"] is not None and environment["engineThread"].is_alive()
+
+
+"""
+Thread function of the engine thread.
+
+Args:
+    eventLoop: The event loop of the engine.
+    printers (list): The printers.
+    realtime (bool): Services the MQTT clients in real-time mode instead of polling them.
+"""
+def runEngine(eventLoop, printers, realtime):
+    global environment
+
+    asyncio.set_event_loop(eventLoop)
+
+    try:
+        eventLoop.run_until_complete(runPrinters(printers, realtime))
+    except Exception as e:
+        log("Error in engine:", e)
+    finally:
+        environment["modelExecutor"].shutdown(wait=False)
+        eventLoop.close()
+        log("Engine stopped")
+        log(f'Reports merged: {metrics["reportsMerged"]}, rendered in {metrics["redraws"]} redraws')
+        log(f'OBS source updates applied: {metrics["updatesApplied"]}, skipped: {metrics["updatesSkipped"]}')
+
+
+"""
+Main task of the engine: connects the printers, runs the timers and cleans up after the stop request.
+
+Args:
+    printers (list): The printers.
+    realtime (bool): Services the MQTT clients in real-time mode instead of polling them.
+"""
+async def runPrinters(printers, realtime):
+    eventLoop = asyncio.get_event_loop()
+
+    for printer in printers:
+        setConnectionState(printer, "connecting")
+
+    # Connecting blocks for the TLS handshake, so the printers connect in parallel in the default executor
+    connected = await asyncio.gather(*[eventLoop.run_in_executor(None, connect, printer) for printer in printers])
+    for printer, printerConnected in zip(printers, connected):
+        if not printerConnected:
+            scheduleReconnect(printer)
+
+    timers = [startEngineTask(redrawPeriodically(printers, realtime)), startEngineTask(keepFtpSessionsAlivePeriodically()),
+              startEngineTask(publishMetricsPeriodically())]
+    if realtime:
+        timers.append(startEngineTask(serviceMqttPeriodically(printers)))
+
+    await environment["engineStopEvent"].wait()
+
+    # Cancel the timers, reconnects and model image requests
+    for printer in printers:
+        printer["modelGeneration"] += 1
+    tasks = list(environment["engineTasks"])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    for printer in printers:
+        disconnect(printer)
+
+    await eventLoop.run_in_executor(environment["modelExecutor"], closeFtpSessions)
+
+
+"""
+Gets the time between two redraws.
+
+Args:
+    realtime (bool): The real-time mode of the engine.
+
+Returns:
+    float: refreshRate redraws per second in real-time mode, otherwise the update interval (seconds).
+"""
+def getRedrawInterval(realtime):
+    if realtime and environment["refreshRate"] > 0:
+        return 1 / environment["refreshRate"]
+    return environment["interval"]
+
+
+"""
+Timer redrawing the printers once per tick.
+Only the latest merged state is rendered; reports received since the previous tick are coalesced into it.
+In polling mode the MQTT connections are serviced by this timer as well.
+
+Args:
+    printers (list): The printers.
+    realtime (bool): The real-time mode of the engine; in polling mode loop() is called every tick.
+"""
+async def redrawPeriodically(printers, realtime):
+    eventLoop = asyncio.get_event_loop()
+
+    while True:
+        start_time = eventLoop.time()
+
+        for printer in printers:
+            try:
+                if not realtime and printer["mqttClient"] is not None:
+                    printer["mqttClient"].loop(timeout=0)
+                renderLatestReport(printer)
+            except Exception as e:
+                log(f'Error in mqtt client loop: {e}')
+
+        await asyncio.sleep(max(0, getRedrawInterval(realtime) - (eventLoop.time() - start_time)))
+
+
+"""
+Timer handling the MQTT keep-alive and timeouts of all printers in real-time mode.
+
+Args:
+    printers (list): The printers.
+"""
+async def serviceMqttPeriodically(printers):
+    while True:
+        await asyncio.sleep(mqttMiscInterval)
+
+        for printer in printers:
+            if printer["mqttClient"] is not None:
+                printer["mqttClient"].loop_misc()
+
+
+"""
+Timer showing the metrics in the metrics source and writing them to the metrics file.
+It always runs and reads both settings every tick, so they can be set and cleared while the engine is running.
+"""
+async def publishMetricsPeriodically():
+    eventLoop = asyncio.get_event_loop()
+    previousMetrics = {}
+    previousTime = eventLoop.time()
+
+    while True:
+        await asyncio.sleep(metricsInterval)
+
+        currentMetrics = getMetrics()
+        now = eventLoop.time()
+
+        if isSourceBound(environment["metricsSource"]):
+            setSourceValue(environment["metricsSource"], formatMetricsText(currentMetrics, previousMetrics, now - previousTime))
+
+        # Writing the file may block on slow disks, so it is left to the default executor
+        if environment["metricsFile"]:
+            await eventLoop.run_in_executor(None, writeMetricsFile, environment["metricsFile"], currentMetrics)
+
+        previousMetrics = currentMetrics
+        previousTime = now
+
+
+"""
+Timer keeping the idle ftp sessions of all printers alive.
+"""
+async def keepFtpSessionsAlivePeriodically():
+    while True:
+        await asyncio.sleep(ftpTransfer.ftpKeepAliveInterval)
+        await asyncio.get_event_loop().run_in_executor(environment["modelExecutor"], keepFtpSessionsAlive)
+
+
+"""
+Callback function for an opened MQTT socket.
+In real-time mode the socket is watched by the event loop, so reports are processed as they arrive.
+
+Args:
+    mqttClient: The MQTT client instance.
+    userdata: The printer the client belongs to.
+    sock: The socket.
+"""
+def onSocketOpen(mqttClient, userdata, sock):
+    if environment["engineRealtime"]:
+        callOnEngine(environment["eventLoop"].add_reader, sock, readMqttSocket, userdata)
+
+
+"""
+Callback function for a closed MQTT socket.
+
+Args:
+    mqttClient: The MQTT client instance.
+    userdata: The printer the client belongs to.
+    sock: The socket.
+"""
+def onSocketClose(mqttClient, userdata, sock):
+    if environment["engineRealtime"]:
+        callOnEngine(environment["eventLoop"].remove_reader, sock)
+        callOnEngine(environment["eventLoop"].remove_writer, sock)
+
+
+"""
+Callback function for an MQTT socket with pending outgoing data.
+
+Args:
+    mqttClient: The MQTT client instance.
+    userdata: The printer the client belongs to.
+    sock: The socket.
+"""
+def onSocketRegisterWrite(mqttClient, userdata, sock):
+    if environment["engineRealtime"]:
+        callOnEngine(environment["eventLoop"].add_writer, sock, writeMqttSocket, userdata)
+
+
+"""
+Callback function for an MQTT socket without pending outgoing data.
+
+Args:
+    mqttClient: The MQTT client instance.
+    userdata: The printer the client belongs to.
+    sock: The socket.
+"""
+def onSocketUnregisterWrite(mqttClient, userdata, sock):
+    if environment["engineRealtime"]:
+        callOnEngine(environment["eventLoop"].remove_writer, sock)
+
+
+"""
+Reads from the MQTT socket of a printer.
+
+Args:
+    printer (dict): The printer
+"""
+def readMqttSocket(printer):
+    mqttClient = printer["mqttClient"]
+    if mqttClient is None:
+        return
+
+    mqttClient.loop_read()
+
+    # Data already decrypted by the TLS layer is not signalled by the event loop
+    clientSocket = mqttClient.socket()
+    while clientSocket is not None and hasattr(clientSocket, "pending") and clientSocket.pending():
+        mqttClient.loop_read()
+        clientSocket = mqttClient.socket()
+
+
+"""
+Writes the pending data to the MQTT socket of a printer.
+
+Args:
+    printer (dict): The printer
+"""
+def writeMqttSocket(printer):
+    if printer["mqttClient"] is not None:
+        printer["mqttClient"].loop_write()
+
+
+"""
+Connects a printer to its MQTT broker.
+
+Args:
+    printer (dict): The printer
+"""
+def connect(printer):
+    global environment
+
+    if printer["mqttClient"] is not None and printer["mqttClient"].is_connected():
+        printer["mqttClient"].disconnect()
+
+    if printer["mqttClient"] is not None:
+        printer["mqttClient"] = None
+
+    log(f'Connecting to MQTT broker of {printer["name"]}...')
+
+    try:
+        # The client is created for the installed paho version
+        printer["mqttClient"] = pahoCompat.createClient(printer)
+
+        # Set username and password if provided
+        printer["mqttClient"].username_pw_set(environment["user"], printer["secret"])
+
+        # Set the callback function
+        printer["mqttClient"].on_message = onMessage
+        pahoCompat.setConnectionCallbacks(printer["mqttClient"], onConnect, onDisconnect)
+        printer["mqttClient"].on_socket_open = onSocketOpen
+        printer["mqttClient"].on_socket_close = onSocketClose
+        printer["mqttClient"].on_socket_register_write = onSocketRegisterWrite
+        printer["mqttClient"].on_socket_unregister_write = onSocketUnregisterWrite
+
+        # The TLS context of the printer resumes the session of the previous connection
+        printer["mqttClient"].tls_set_context(printer["tlsContexts"].mqttContext)
+        printer["mqttClient"].connect(printer["host"], environment["mqttPort"], 60)
+
+    except Exception as e:
+        handleConnectionError(printer, e)
+        return False
+
+    return True
+
+"""
+Reconnects a printer to its MQTT broker.
+
+Args:
+    printer (dict): The printer
+
+Returns:
+    bool: True if the connection has been established.
+"""
+def reconnect(printer):
+    global environment
+
+    if printer["mqttClient"] is None:
+        return connect(printer)
+
+    try:
+        printer["mqttClient"].reconnect()
+    except Exception as e:
+        handleConnectionError(printer, e)
+        return False
+
+    return True
+
+
+"""
+Handles a failed connection attempt of a printer.
+A certificate which does not match the pinned fingerprint stops the printer like a wrong access code.
+
+Args:
+    printer (dict): The printer
+    error (Exception): The error of the connection attempt
+"""
+def handleConnectionError(printer, error):
+    log("Error connecting to MQTT broker:", error)
+
+    if isinstance(error, tlsContexts.CertificateMismatch):
+        printer["stopped"] = True
+        setConnectionState(printer, "certificateMismatch")
+
+
+"""
+Shows the connection state of a printer in its connection status source.
+
+Args:
+    printer (dict): The printer
+    state (str): The connection state, see connectionStateTexts
+    retryDelay (float): Seconds until the next connection attempt
+"""
+def setConnectionState(printer, state, retryDelay=0):
+    printer["connectionState"] = state
+    setSourceValue(printer["sources"]["connection"], connectionStateTexts[state].format(round(retryDelay)))
+
+
+"""
+Calculates the delay before the next reconnect attempt of a printer.
+The delay grows exponentially with the failed attempts; once circuitBreakerThreshold is reached the circuit
+is open and the printer is only probed every circuitOpenDelay.
+
+Args:
+    attempts (int): Failed connection attempts since the last successful connection.
+
+Returns:
+    float: The delay in seconds.
+"""
+def getReconnectDelay(attempts):
+    if attempts >= circuitBreakerThreshold:
+        delay = circuitOpenDelay
+    else:
+        delay = min(reconnectMaxDelay, reconnectDelay * 2 ** (attempts - 1))
+
+    return delay * (1 - reconnectJitter * random.random())
+
+
+"""
+Schedules a reconnect of a printer on the engine with exponential backoff.
+Must be called on the engine thread.
+
+Args:
+    printer (dict): The printer
+"""
+def scheduleReconnect(printer):
+    if printer["reconnectTask"] is not None or printer["stopped"]:
+        return
+
+    printer["reconnectAttempts"] += 1
+    delay = getReconnectDelay(printer["reconnectAttempts"])
+
+    if printer["reconnectAttempts"] < circuitBreakerThreshold:
+        setConnectionState(printer, "reconnecting", delay)
+    else:
+        if printer["connectionState"] != "unavailable":
+            log(f'{printer["name"]} is not reachable; retrying every {circuitOpenDelay} seconds')
+        setConnectionState(printer, "unavailable", delay)
+
+    printer["reconnectTask"] = startEngineTask(reconnectLater(printer, delay))
+
+
+"""
+Engine task reconnecting a printer after a delay.
+The blocking connect runs in the default executor, so the other printers are serviced meanwhile.
+
+Args:
+    printer (dict): The printer
+    delay (float): The delay in seconds
+"""
+async def reconnectLater(printer, delay):
+    await asyncio.sleep(delay)
+
+    log(f'Reconnecting to MQTT broker of {printer["name"]} (attempt {printer["reconnectAttempts"]})...')
+    metrics["reconnects"] += 1
+    reconnected = await asyncio.get_event_loop().run_in_executor(None, reconnect, printer)
+
+    printer["reconnectTask"] = None
+    if not reconnected:
+        scheduleReconnect(printer)
+
+
+"""
+Disconnects a printer from its MQTT broker.
+
+Args:
+    printer (dict): The printer
+"""
+def disconnect(printer):
+    if printer["mqttClient"] is not None and printer["mqttClient"].is_connected():
+        printer["mqttClient"].disconnect()
+    printer["mqttClient"] = None  
+
+    printer["printerState"] = {}
+    printer["changedKeys"] = set()
+    printer["amsIndex"] = {}
+
+    if not printer["stopped"]:
+        setConnectionState(printer, "disconnected")
+
+
+"""
+Callback function for MQTT connection.
+Called with the paho-mqtt 1.x signature with both paho versions, see pahoCompat.setConnectionCallbacks().
+
+Args:
+    mqttClient: The MQTT clientinstance.
+    userdata: The user data.
+    flags: The flags.
+    rc: The return code.
+"""
+def onConnect(mqttClient, userdata, flags, rc):
+    printer = userdata
+
+    if not mqttClient.is_connected():
+        return
+
+    log(f'MQTT connection to {printer["name"]} successful')
+
+    # The session tickets have arrived with the CONNACK at the latest
+    printer["tlsContexts"].mqttContext.storeSession(mqttClient.socket())
+
+    printer["reconnectAttempts"] = 0
+    setConnectionState(printer, "connected")
+
+    mqttTopic = "device/" + printer["serialNumber"] + "/report"
+    mqttClient.subscribe(mqttTopic)
+
+
+"""
+Callback function for MQTT disconnection.
+Called with the paho-mqtt 1.x signature and error codes with both paho versions, see pahoCompat.setConnectionCallbacks().
+
+Args:
+    mqttClient: The MQTT client instance.
+    userdata: The printer the client belongs to.
+    rc: The disconnection return code.
+"""
+def onDisconnect(mqttClient, userdata, rc):
+    printer = userdata
+
+    if rc == 5:
+        log(f'Incorrect access code of {printer["name"]}; please verify it')
+        printer["stopped"] = True
+        setConnectionState(printer, "denied")
+        return
+
+    elif rc != 0:
+        log(f'Unexpected disconnection from MQTT broker of {printer["name"]}: {rc}')
+
+        # Reconnecting blocks, so it is left to the engine
+        callOnEngine(scheduleReconnect, printer)
+        return
+
+
+"""
+Callback function for the start button.
+
+Args:
+    props: The properties.
+    prop: The property.
+"""
+def startButtonPressed(props, prop):
+    global environment
+
+    # Sources may have been edited in the meantime, so everything is written once again
+    with pendingUpdatesLock:
+        pendingUpdates.clear()
+    resetRenderedValues()
+    resetMetrics()
+
+    # The printer maintained in the settings and the additional printers of the printer file
+    printers = []
+    printerFields = {"MQTT Host": environment["host"], "Access code": environment["secret"], "Serialnumber": environment["serialNumber"]}
+    missingFields = [fieldName for fieldName, value in printerFields.items() if value == ""]
+    if not missingFields:
+        printers.append(createPrinter(environment["serialNumber"], environment["host"], environment["serialNumber"], environment["secret"], sourcesName,
+                                      environment["certificateFingerprint"]))
+    elif len(missingFields) < len(printerFields):
+        # A half maintained printer is not started, like the entries of the printer file
+        log("The printer in the settings is missing " + ", ".join(missingFields))
+
+    if environment["printersFile"]:
+        printers.extend(loadPrinterFile(environment["printersFile"]))
+
+    # Checking if all required fields are maintained
+    if not printers:
+        log("Some required fields are missing")
+        return
+
+    # Checking if at least one output source is maintained
+    if not any(any(printer["sources"].values()) for printer in printers):
+        log("No output source maintained")
+        return
+
+    # If there is a running engine, stop it
+    if isEngineRunning():
+        stopEngine()
+        environment["engineThread"].join()  # Wait for the engine to disconnect the printers
+        log("Existing engine stopped")
+
+    # Printers which cannot be reached now are reconnected by the engine
+    environment["printers"] = printers
+    resolveSourceHandles()
+    startEngine(printers)
+
+
+"""
+Callback function for the stop button.
+
+Args:
+    props: The properties.
+    prop: The property.
+"""
+def stopButtonPressed(props, prop):
+    stopEngine()
+
+
+"""
+Callback function for the export profiling trace button.
+
+Args:
+    props: The properties.
+    prop: The property.
+"""
+def exportProfileButtonPressed(props, prop):
+    if not environment["profileFile"]:
+        log("No profiling trace file maintained")
+        return
+
+    try:
+        eventCount = exportProfile(environment["profileFile"])
+    except OSError as e:
+        log("Error writing profiling trace:", e)
+        return
+
+    log(f'Profiling trace with {eventCount} stages written to {environment["profileFile"]}')
+
+
+"""
+Sets up the properties for the script.
+"""
+def script_properties():
+    props = obs.obs_properties_create()
+
+    obs.obs_properties_add_button(props, "start_button", "START", startButtonPressed)
+    obs.obs_properties_add_button(props, "stop_button", "STOP", stopButtonPressed)
+    obs.obs_properties_add_text(props, "paragraph1", "", obs.OBS_TEXT_INFO)
+
+    obs.obs_properties_add_text(props, "host", "MQTT Host*", obs.OBS_TEXT_DEFAULT)
+    obs.obs_properties_add_text(props, "password", "Access code*", obs.OBS_TEXT_PASSWORD)
+    obs.obs_properties_add_text(props, "serialNumber", "Serialnumber*", obs.OBS_TEXT_DEFAULT)
+    obs.obs_properties_add_text(props, "certificateFingerprint", "Certificate fingerprint (SHA-256, optional)", obs.OBS_TEXT_DEFAULT)
+    obs.obs_properties_add_path(props, "printersFile", "Additional printers (JSON file)", obs.OBS_PATH_FILE, "JSON files (*.json)", None)
+    obs.obs_properties_add_int(props, "interval", "Update Interval (seconds)*", 1, 3600, 1)
+    obs.obs_properties_add_bool(props, "realtime", "Real-time mode (reports are received as they arrive)")
+    obs.obs_properties_add_float(props, "refreshRate", "Redraws per second in real-time mode", 0.1, 30, 0.1)
+    obs.obs_properties_add_text(props, "requiredInfo", "* required fields", obs.OBS_TEXT_INFO)
+    obs.obs_properties_add_text(props, "paragraph2", "", obs.OBS_TEXT_INFO)
+
+    # plate selection
+    dropDownPlate = obs.obs_properties_add_list(props, "plate", "Plate", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownPlate,  "Bambu Cool Plate", "Bambu Cool Plate")
+    obs.obs_property_list_add_string(dropDownPlate, "Bambu Engineering Plate", "Bambu Engineering Plate")
+    obs.obs_property_list_add_string(dropDownPlate, "Bambu High Temperature Plate (PEI)", "Bambu High Temperature Plate (PEI)")
+    obs.obs_property_list_add_string(dropDownPlate, "Bambu Dual-Sided Smooth PEI Plate", "Bambu Dual-Sided Smooth PEI Plate")
+    obs.obs_property_list_add_string(dropDownPlate, "Bambu Textured PEI Plate", "Bambu Textured PEI Plate")
+
+    obs.obs_properties_add_path(props, "imageFolderPath", "Image path", obs.OBS_PATH_DIRECTORY, "Select directory", None)
+    obs.obs_properties_add_bool(props, "partialModelDownload", "Only download the model image from the 3mf file")
+    obs.obs_properties_add_int(props, "modelCacheSize", "Model image cache size (MB)", 1, 10240, 1)
+    obs.obs_properties_add_int(props, "modelSpoolThreshold", "Keep 3mf downloads in memory up to (MB)", 1, 1024, 1)
+
+    # Picture source for plate
+    dropDownPlateSource = obs.obs_properties_add_list(props, "sourcePlate", "Picture source for plate", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownPlateSource, "[No source]", "[No source]")
+
+    # Picture source for model
+    dropDownModelSource = obs.obs_properties_add_list(props, "sourceModel", "Picture source for model", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownModelSource, "[No source]", "[No source]")
+
+    obs.obs_properties_add_text(props, "paragraph3", "", obs.OBS_TEXT_INFO)
+
+    # Text source for nozzle type
+    dropDownNozzleType = obs.obs_properties_add_list(props, "sourceNozzleType", "Text source for nozzle type", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownNozzleType, "[No source]", "[No source]")
+
+    # Text source for nozzle temperature
+    dropDownNozzleTemp = obs.obs_properties_add_list(props, "sourceNozzleTemp", "Text source for nozzle temperature", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownNozzleTemp, "[No source]", "[No source]")
+
+    # Text source for bed temperature
+    dropDownBedTemp = obs.obs_properties_add_list(props, "sourceBedTemp", "Text source for bed temperature", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownBedTemp, "[No source]", "[No source]")
+
+    # Text source for chamber temperature
+    dropDownChamberTemp = obs.obs_properties_add_list(props, "sourceChamberTemp", "Text source for chamber temperature", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownChamberTemp, "[No source]", "[No source]")
+
+    # Text source for remaining print time
+    dropDownRemainingTime = obs.obs_properties_add_list(props, "sourceRemainingTime", "Text source for remaining print time", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownRemainingTime, "[No source]", "[No source]")
+
+    # Text source for current layer
+    dropDownLayer = obs.obs_properties_add_list(props, "sourceLayer", "Text source for current layer", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownLayer, "[No source]", "[No source]")
+
+    # Text source for filament
+    dropDownFilament = obs.obs_properties_add_list(props, "sourceFilament", "Text source for filament", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownFilament, "[No source]", "[No source]")
+
+    # Text source for filament color
+    dropDownFilamentColor = obs.obs_properties_add_list(props, "sourceFilamentColor", "Text source for filament color", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownFilamentColor, "[No source]", "[No source]")
+
+    # Text source for print completion percentage
+    dropDownPercentFinish = obs.obs_properties_add_list(props, "sourcePercentFinish", "Text source for print completion percentage", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownPercentFinish, "[No source]", "[No source]")
+
+    # Text source for connection status
+    dropDownConnection = obs.obs_properties_add_list(props, "sourceConnection", "Text source for connection status", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownConnection, "[No source]", "[No source]")
+
+    obs.obs_properties_add_text(props, "paragraph4", "", obs.OBS_TEXT_INFO)
+
+    # Text source for the metrics (debug overlay)
+    dropDownMetrics = obs.obs_properties_add_list(props, "sourceMetrics", "Text source for metrics (debug overlay)", obs.OBS_COMBO_TYPE_EDITABLE, obs.OBS_COMBO_FORMAT_STRING)
+    obs.obs_property_list_add_string(dropDownMetrics, "[No source]", "[No source]")
+
+    obs.obs_properties_add_path(props, "metricsFile", "Metrics file (Prometheus format)", obs.OBS_PATH_FILE_SAVE, "Prometheus files (*.prom)", None)
+    obs.obs_properties_add_bool(props, "profiling", "Record profiling trace of the pipeline stages")
+    obs.obs_properties_add_path(props, "profileFile", "Profiling trace file (Chrome trace JSON)", obs.OBS_PATH_FILE_SAVE, "Trace files (*.json)", None)
+    obs.obs_properties_add_button(props, "export_profile_button", "Export profiling trace", exportProfileButtonPressed)
+
+    # Getting sources
+    sources = obs.obs_enum_sources()
+    
+    if sources:
+        for source in sources:
+            source_id = obs.obs_source_get_unversioned_id(source)
+            name = obs.obs_source_get_name(source)
+
+            # Adding dropdown list items for text sources
+            if source_id in ("text_gdiplus", "text_ft2_source"):
+                obs.obs_property_list_add_string(dropDownFilamentColor, name, name)
+                obs.obs_property_list_add_string(dropDownNozzleType, name, name)
+                obs.obs_property_list_add_string(dropDownNozzleTemp, name, name)
+                obs.obs_property_list_add_string(dropDownBedTemp, name, name)
+                obs.obs_property_list_add_string(dropDownChamberTemp, name, name)
+                obs.obs_property_list_add_string(dropDownRemainingTime, name, name)
+                obs.obs_property_list_add_string(dropDownLayer, name, name)
+                obs.obs_property_list_add_string(dropDownFilament, name, name)
+                obs.obs_property_list_add_string(dropDownPercentFinish, name, name)
+                obs.obs_property_list_add_string(dropDownConnection, name, name)
+                obs.obs_property_list_add_string(dropDownMetrics, name, name)
+
+            # Adding dropdown list items for color sources
+            elif source_id == "color_source":
+                obs.obs_property_list_add_string(dropDownFilamentColor, name, name)
+
+            # Adding dropdown list items for image sources
+            if source_id == "image_source":
+                obs.obs_property_list_add_string(dropDownPlateSource, name, name)
+                obs.obs_property_list_add_string(dropDownModelSource, name, name)
+
+    if sources:
+        obs.source_list_release(sources)
+
+    return props
+
+"""
+Called when the script is loaded.
+Registers the timer applying the source updates on the OBS main thread and the signals invalidating the held
+source references. Logs the JSON decoder used for the printer reports.
+
+Args:
+    settings: The settings.
+"""
+def script_load(settings):
+    obs.timer_add(applySourceUpdates, sourceUpdateInterval)
+    connectSourceSignals(True)
+    log(f"Decoding printer reports with {jsonDecoderName}")
+
+
+"""
+Called when the script is unloaded.
+"""
+def script_unload():
+    global environment
+
+    obs.timer_remove(applySourceUpdates)
+    stopEngine()
+
+    connectSourceSignals(False)
+    releaseSourceHandles()
+    releaseSourceSettings()
+
+
+"""
+Sets the default values of the script settings.
+
+Args:
+    settings: The settings.
+"""
+def script_defaults(settings):
+    obs.obs_data_set_default_int(settings, "interval", 5)
+    obs.obs_data_set_default_bool(settings, "realtime", True)
+    obs.obs_data_set_default_double(settings, "refreshRate", 1)
+    obs.obs_data_set_default_bool(settings, "partialModelDownload", True)
+    obs.obs_data_set_default_int(settings, "modelCacheSize", 50)
+    obs.obs_data_set_default_int(settings, "modelSpoolThreshold", 16)
+
+
+"""
+Updates the script settings.
+Called when the script’s settings (if any) have been changed by the user.
+
+Args:
+    settings: The settings.
+"""
+def script_update(settings):
+    global environment
+
+    # Source variable
+    global sourcesName
+
+    global profilingEnabled
+
+    # Read user-defined settings
+    environment["host"]  = obs.obs_data_get_string(settings, "host")
+    environment["secret"] = obs.obs_data_get_string(settings, "password")
+    environment["serialNumber"] = obs.obs_data_get_string(settings, "serialNumber")
+    environment["certificateFingerprint"] = obs.obs_data_get_string(settings, "certificateFingerprint")
+    environment["printersFile"] = obs.obs_data_get_string(settings, "printersFile")
+    environment["interval"] = obs.obs_data_get_int(settings, "interval")
+    realtime = obs.obs_data_get_bool(settings, "realtime")
+    if realtime != environment["realtime"] and isEngineRunning():
+        log("The real-time mode is changed at the next START")
+    environment["realtime"] = realtime
+    environment["refreshRate"] = obs.obs_data_get_double(settings, "refreshRate")
+    environment["imageFolderPath"] = obs.obs_data_get_string(settings, "imageFolderPath")
+    environment["partialModelDownload"] = obs.obs_data_get_bool(settings, "partialModelDownload")
+    environment["modelCacheSize"] = obs.obs_data_get_int(settings, "modelCacheSize")
+    environment["modelSpoolThreshold"] = obs.obs_data_get_int(settings, "modelSpoolThreshold")
+    environment["metricsSource"] = obs.obs_data_get_string(settings, "sourceMetrics")
+    environment["metricsFile"] = obs.obs_data_get_string(settings, "metricsFile")
+    environment["profileFile"] = obs.obs_data_get_string(settings, "profileFile")
+
+    # A new recording starts whenever profiling is switched on
+    profiling = obs.obs_data_get_bool(settings, "profiling")
+    if profiling and not profilingEnabled:
+        profileEvents.clear()
+    profilingEnabled = profiling
+    
+    # Read user-defined text sources
+    sourcesName["nozzleType"] = obs.obs_data_get_string(settings, "sourceNozzleType")
+    sourcesName["nozzleTemp"] = obs.obs_data_get_string(settings, "sourceNozzleTemp")
+    sourcesName["bedTemp"] = obs.obs_data_get_string(settings, "sourceBedTemp")
+    sourcesName["chamberTemp"] = obs.obs_data_get_string(settings, "sourceChamberTemp")
+    sourcesName["remainingTime"] = obs.obs_data_get_string(settings, "sourceRemainingTime")
+    sourcesName["layer"] = obs.obs_data_get_string(settings, "sourceLayer")
+    sourcesName["filament"] = obs.obs_data_get_string(settings, "sourceFilament")
+    sourcesName["filamentColor"] = obs.obs_data_get_string(settings, "sourceFilamentColor")
+    sourcesName["percentFinish"] = obs.obs_data_get_string(settings, "sourcePercentFinish")
+    sourcesName["model"] = obs.obs_data_get_string(settings, "sourceModel")
+    sourcesName["connection"] = obs.obs_data_get_string(settings, "sourceConnection")
+
+    # Only the report keys needed by the bound sources are extracted from the reports
+    for printer in environment["printers"]:
+        printer["reportKeys"] = getReportKeys(printer["sources"])
+
+    # The bound sources are updated through held references instead of looking them up by name each time
+    resolveSourceHandles()
+
+    sourcePlate = obs.obs_data_get_string(settings, "sourcePlate")
+    plate = obs.obs_data_get_string(settings, "plate")
+
+    if environment["imageFolderPath"] and sourcePlate != "" and sourcePlate != "[No picture source]" and plate:
+
+        # Getting image source to show the plate
+        source = obs.obs_get_source_by_name(sourcePlate)
+        if source is not None:
+            # Setting image path to image source
+            text_settings = obs.obs_data_create()
+            imageUrl = os.path.join(environment["imageFolderPath"], get_plate_key_from_value(plate))
+            obs.obs_data_set_string(text_settings, "file", imageUrl)
+            obs.obs_source_update(source, text_settings)
+            obs.obs_data_release(text_settings)
+            obs.obs_source_release(source)
\ No newline at end of file
@@ -0,0 +1,77 @@
+# Compatibility of the OBS script with paho-mqtt 1.x and 2.x
+# Author: Mia Sophie Behrendt; Maker-Hub.de
+# Description: Creates the MQTT clients and adapts the callbacks of paho-mqtt 2.x to the paho-mqtt 1.x signatures
+
+import paho.mqtt.client as mqtt
+
+# paho-mqtt 2.x requires the callback API version when creating a client
+pahoVersion2 = hasattr(mqtt, "CallbackAPIVersion")
+
+# CONNACK return codes of MQTT 3.1.1 keyed by the name of the reason code reported by paho-mqtt 2.x
+connackReturnCodes = {
+    "Success": mqtt.CONNACK_ACCEPTED,
+    "Unsupported protocol version": mqtt.CONNACK_REFUSED_PROTOCOL_VERSION,
+    "Client identifier not valid": mqtt.CONNACK_REFUSED_IDENTIFIER_REJECTED,
+    "Server unavailable": mqtt.CONNACK_REFUSED_SERVER_UNAVAILABLE,
+    "Bad user name or password": mqtt.CONNACK_REFUSED_BAD_USERNAME_PASSWORD,
+    "Not authorized": mqtt.CONNACK_REFUSED_NOT_AUTHORIZED
+}
+
+# paho-mqtt 1.x error codes keyed by the name of the disconnect reason code reported by paho-mqtt 2.x
+disconnectErrorCodes = {
+    "Success": mqtt.MQTT_ERR_SUCCESS,
+    "Normal disconnection": mqtt.MQTT_ERR_SUCCESS,
+    "Keep alive timeout": mqtt.MQTT_ERR_KEEPALIVE
+}
+
+
+"""
+Creates an MQTT client.
+
+Args:
+    userdata: The user data passed to the callbacks.
+
+Returns:
+    mqtt.Client: The client.
+"""
+def createClient(userdata):
+    if pahoVersion2:
+        return mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, userdata=userdata)
+    return mqtt.Client(userdata=userdata)
+
+
+"""
+Sets the connect and disconnect callbacks of a client.
+The callbacks are called with the paho-mqtt 1.x signatures and return codes with both paho versions:
+onConnect(mqttClient, userdata, flags, rc) with the CONNACK return code and onDisconnect(mqttClient, userdata, rc)
+with the paho-mqtt 1.x error code, e.g. MQTT_ERR_CONN_REFUSED after a refused connection.
+
+Args:
+    mqttClient (mqtt.Client): The client.
+    onConnect: The connect callback.
+    onDisconnect: The disconnect callback.
+"""
+def setConnectionCallbacks(mqttClient, onConnect, onDisconnect):
+    if not pahoVersion2:
+        mqttClient.on_connect = onConnect
+        mqttClient.on_disconnect = onDisconnect
+        return
+
+    # paho-mqtt 2.x reports a refused connection only to on_connect; paho-mqtt 1.x passes it to on_disconnect as well
+    connectionRefused = [False]
+
+    def onConnectVersion2(mqttClient, userdata, flags, reasonCode, properties):
+        rc = connackReturnCodes.get(reasonCode.getName(), mqtt.CONNACK_REFUSED_NOT_AUTHORIZED if reasonCode.is_failure else mqtt.CONNACK_ACCEPTED)
+        connectionRefused[0] = rc != mqtt.CONNACK_ACCEPTED
+        onConnect(mqttClient, userdata, {"session present": int(flags.session_present)}, rc)
+
+    def onDisconnectVersion2(mqttClient, userdata, flags, reasonCode, properties):
+        if connectionRefused[0]:
+            connectionRefused[0] = False
+            rc = mqtt.MQTT_ERR_CONN_REFUSED
+        else:
+            rc = disconnectErrorCodes.get(reasonCode.getName(), mqtt.MQTT_ERR_CONN_LOST)
+        onDisconnect(mqttClient, userdata, rc)
+
+    mqttClient.on_connect = onConnectVersion2
+    mqttClient.on_disconnect = onDisconnectVersion2
@@ -0,0 +1,131 @@
+# TLS contexts of the connections to a BambuLab printer
+# Author: Mia Sophie Behrendt; Maker-Hub.de
+# Description: Reusable TLS client contexts for MQTT and FTPS with session resumption and certificate pinning
+
+import ssl
+import hashlib
+import re
+
+from .logger import log
+
+
+class CertificateMismatch(ssl.SSLError):
+    """Raised when the certificate of the printer does not match the pinned fingerprint."""
+
+
+class PrinterTlsContext(ssl.SSLContext):
+    """TLS client context of one service of a printer, created once and reused for every connection."""
+    """The session of the last connection is resumed, so reconnects skip the full handshake if the printer allows it."""
+    """The printers use self-signed certificates; instead of the chain the SHA-256 fingerprint is checked if pinned."""
+    name = ""
+    pinnedFingerprint = None
+    session = None
+    handshakes = 0
+    resumedHandshakes = 0
+    fingerprintLogged = False
+
+    def wrap_socket(self, sock, *args, **kwargs):
+        """Wraps a socket, resumes the last session unless another one is given and checks the pinned certificate."""
+        if kwargs.get("session") is None:
+            kwargs["session"] = self.session
+
+        sslSocket = super().wrap_socket(sock, *args, **kwargs)
+
+        # paho defers the handshake; it is done here to check the certificate before anything is sent
+        if not kwargs.get("do_handshake_on_connect", True):
+            sslSocket.do_handshake()
+
+        self.handshakes += 1
+        if sslSocket.session_reused:
+            self.resumedHandshakes += 1
+        else:
+            self.checkCertificate(sslSocket)
+
+        return sslSocket
+
+    def checkCertificate(self, sslSocket):
+        """Compares the certificate of a full handshake with the pinned fingerprint; logs it once if none is pinned."""
+        fingerprint = hashlib.sha256(sslSocket.getpeercert(binary_form=True) or b"").hexdigest()
+
+        if self.pinnedFingerprint is None:
+            if not self.fingerprintLogged:
+                self.fingerprintLogged = True
+                log(f"Certificate fingerprint of {self.name}: {formatFingerprint(fingerprint)}")
+            return
+
+        if fingerprint != self.pinnedFingerprint:
+            sslSocket.close()
+            raise CertificateMismatch(ssl.SSL_ERROR_SSL, f"certificate {formatFingerprint(fingerprint)} of {self.name} does not match the pinned fingerprint")
+
+    def storeSession(self, sslSocket):
+        """Keeps the session of a connection for the next one."""
+        """TLS 1.3 sends the session tickets after the handshake, so it is called once the server has replied."""
+        if isinstance(sslSocket, ssl.SSLSocket) and sslSocket.session is not None:
+            self.session = sslSocket.session
+
+
+class TlsContextManager:
+    """Creates the TLS contexts of a printer once and keeps them across reconnects and ftp sessions."""
+    def __init__(self, name, certificateFingerprint=""):
+        pinnedFingerprint = parseFingerprint(certificateFingerprint)
+        self.mqttContext = createContext(name + " (MQTT)", pinnedFingerprint)
+        self.ftpContext = createContext(name + " (FTPS)", pinnedFingerprint)
+
+    def contexts(self):
+        """Returns the contexts of the printer."""
+        return self.mqttContext, self.ftpContext
+
+
+"""
+Creates the TLS client context for one service of a printer.
+
+Args:
+    name (str): The name of the printer and the service used in the log.
+    pinnedFingerprint (str): The SHA-256 fingerprint of the certificate in lower case hex or None.
+
+Returns:
+    PrinterTlsContext: The context.
+"""
+def createContext(name, pinnedFingerprint):
+    context = PrinterTlsContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    context.name = name
+    context.pinnedFingerprint = pinnedFingerprint
+    return context
+
+
+"""
+Parses a SHA-256 certificate fingerprint.
+Upper and lower case hex with or without colons or spaces is accepted, as shown by browsers and openssl.
+
+Args:
+    certificateFingerprint (str): The fingerprint or an empty string.
+
+Returns:
+    str: The fingerprint in lower case hex or None if no fingerprint is given.
+
+Raises:
+    ValueError: If the fingerprint is no SHA-256 fingerprint.
+"""
+def parseFingerprint(certificateFingerprint):
+    fingerprint = re.sub(r"[\s:]", "", certificateFingerprint or "").lower()
+    if not fingerprint:
+        return None
+
+    if not re.fullmatch(r"[0-9a-f]{64}", fingerprint):
+        raise ValueError(f"{certificateFingerprint} is no SHA-256 fingerprint")
+    return fingerprint
+
+
+"""
+Formats a fingerprint like openssl shows it.
+
+Args:
+    fingerprint (str): The fingerprint in lower case hex.
+
+Returns:
+    str: The fingerprint in upper case hex with colons.
+"""
+def formatFingerprint(fingerprint):
+    return ":".join(fingerprint[index:index + 2] for index in range(0, len(fingerprint), 2)).upper()
@@ -0,0 +1,197 @@
+# Benchmark of the load time of the OBS script
+# Description: Measures in fresh interpreters how long loading the script takes (OBS startup and "Reload Scripts")
+# and how long the first START takes to load the modules needed for servicing the printers
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+benchmarkFolderPath = os.path.dirname(os.path.abspath(__file__))
+
+# Script measured if no other script is given
+defaultScriptPath = os.path.join(os.path.dirname(benchmarkFolderPath), "obsBambuLabX1Cmqtt311.py")
+
+# Metrics compared by --compare; lower values are better for all of them
+comparedMetrics = ("scriptLoad", "engineModulesLoad")
+
+# Program run in each fresh interpreter; prints the measured times (json is not imported, the script may need it)
+measureProgram = """
+import importlib.util
+import os
+import sys
+import time
+
+benchmarkFolderPath, scriptPath = sys.argv[1:3]
+sys.path.insert(0, benchmarkFolderPath)
+import obspython
+
+# OBS adds the folder of the script to the module path
+sys.path.insert(0, os.path.dirname(os.path.abspath(scriptPath)))
+
+print("loadScript", file=sys.stderr, flush=True)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("bambuLabScript", scriptPath)
+script = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = script
+spec.loader.exec_module(script)
+scriptLoad = time.perf_counter() - start
+
+# Older versions of the script load all modules when the script is loaded
+core = sys.modules[script.script_load.__module__]
+engineModulesLoad = None
+if hasattr(core, "loadEngineModules"):
+    print("loadEngineModules", file=sys.stderr, flush=True)
+    start = time.perf_counter()
+    core.loadEngineModules()
+    engineModulesLoad = time.perf_counter() - start
+
+print(scriptLoad, engineModulesLoad)
+"""
+
+
+"""
+Loads the script in a fresh interpreter.
+
+Args:
+    scriptPath (str): The path of the script.
+    importTime (bool): Passes -X importtime to the interpreter.
+
+Returns:
+    tuple: The measured times (seconds) and the import time report of the interpreter.
+"""
+def measureOnce(scriptPath, importTime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importTime else []) + ["-c", measureProgram, benchmarkFolderPath, scriptPath]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    scriptLoad, engineModulesLoad = result.stdout.split()[-2:]
+    times = {"scriptLoad": float(scriptLoad), "engineModulesLoad": None if engineModulesLoad == "None" else float(engineModulesLoad)}
+    return times, result.stderr
+
+
+"""
+Gets the slowest modules imported directly by the script or its core package from an import time report.
+Imports of the first START are not included.
+
+Args:
+    report (str): The output of -X importtime.
+    count (int): Number of modules.
+
+Returns:
+    list: Tuples of the module name and its cumulative import time (seconds).
+"""
+def slowestImports(report, count):
+    imports = []
+    nestedImports = []
+    lines = report.splitlines()
+    for line in lines[lines.index("loadScript") + 1:]:
+        if line == "loadEngineModules":
+            break
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+
+        # Nested imports are reported before the module importing them
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entry = (name.strip(), int(cumulative) / 1e6)
+        if depth == 1:
+            nestedImports.append(entry)
+        elif depth == 0:
+            # The modules of the core package are replaced by the modules they import
+            if entry[0].startswith("bambuLabCore"):
+                imports.extend(nestedEntry for nestedEntry in nestedImports if not nestedEntry[0].startswith("bambuLabCore"))
+            else:
+                imports.append(entry)
+            nestedImports = []
+
+    return sorted(imports, key=lambda entry: entry[1], reverse=True)[:count]
+
+
+"""
+Benchmarks the load time of a script.
+The first run writes the bytecode cache and is not counted, like OBS loads the script from an existing cache.
+
+Args:
+    scriptPath (str): The path of the script.
+    repeat (int): Number of measured interpreters.
+
+Returns:
+    dict: The median times (seconds).
+"""
+def benchmarkScript(scriptPath, repeat):
+    measureOnce(scriptPath)
+    runs = [measureOnce(scriptPath)[0] for _ in range(repeat)]
+
+    results = {"scriptLoad": statistics.median(run["scriptLoad"] for run in runs), "engineModulesLoad": None}
+    if runs[0]["engineModulesLoad"] is not None:
+        results["engineModulesLoad"] = statistics.median(run["engineModulesLoad"] for run in runs)
+    return results
+
+
+"""
+Compares the results with saved results.
+
+Args:
+    results (dict): The results.
+    baseline (dict): The saved results.
+    tolerance (float): Allowed relative degradation of each metric.
+
+Returns:
+    list: Descriptions of the metrics which degraded by more than the tolerance.
+"""
+def compareResults(results, baseline, tolerance):
+    regressions = []
+    for metric in comparedMetrics:
+        value = results.get(metric)
+        baseValue = baseline.get(metric)
+        if value is None or not baseValue:
+            continue
+
+        change = (value - baseValue) / baseValue
+        if change > tolerance:
+            regressions.append(f"{metric}: {baseValue * 1000:.1f} ms -> {value * 1000:.1f} ms ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the time OBS needs to load the script and the first START needs to load the engine modules.")
+    parser.add_argument("--script", default=defaultScriptPath, help="path of the OBS script (default: obsBambuLabX1Cmqtt311.py)")
+    parser.add_argument("--repeat", type=int, default=10, help="number of measured interpreters (default: 10)")
+    parser.add_argument("--modules", type=int, default=10, help="number of the slowest imports listed (default: 10)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with a JSON file written by --save and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative degradation for --compare (default: 0.2)")
+    args = parser.parse_args()
+
+    results = benchmarkScript(args.script, args.repeat)
+    print(f"Script: {os.path.basename(args.script)}, Python {sys.version.split()[0]}, median of {args.repeat} interpreters")
+    print(f'Script load:         {results["scriptLoad"] * 1000:7.1f} ms')
+    if results["engineModulesLoad"] is None:
+        print("Engine modules load:     n/a (loaded with the script)")
+    else:
+        print(f'Engine modules load: {results["engineModulesLoad"] * 1000:7.1f} ms (first START)')
+
+    if args.modules > 0:
+        print("Slowest imports when loading the script:")
+        for name, cumulative in slowestImports(measureOnce(args.script, importTime=True)[1], args.modules):
+            print(f"  {cumulative * 1000:7.1f} ms  {name}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as resultFile:
+            json.dump(results, resultFile, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as baselineFile:
+            regressions = compareResults(results, json.load(baselineFile), args.tolerance)
+
+        for regression in regressions:
+            print("Regression:", regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
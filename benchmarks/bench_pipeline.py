@@ -0,0 +1,409 @@
+# Benchmark of the report pipeline of the OBS script
+# Description: Replays recorded printer reports through onMessage() and the render path against the obspython stub
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+
+import obspython
+
+benchmarkFolderPath = os.path.dirname(os.path.abspath(__file__))
+
+# Script measured if no other script is given
+defaultScriptPath = os.path.join(os.path.dirname(benchmarkFolderPath), "obsBambuLabX1Cmqtt311.py")
+
+# Recordings replayed if no other recordings are given
+defaultRecordingsPath = os.path.join(benchmarkFolderPath, "recordings")
+
+# Metrics compared by --compare; True if a higher value is better
+comparedMetrics = {
+    "messagesPerSecond": True,
+    "handlerP50": False,
+    "handlerP99": False,
+    "renderP99": False,
+    "peakBytesPerMessage": False
+}
+
+
+class Message:
+    """MQTT message passed to onMessage()."""
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+"""
+Loads the OBS script like OBS does and gets the module implementing it.
+Older versions of the script, which are not split into the core package yet, implement it themselves.
+
+Args:
+    scriptPath (str): The path of the script.
+
+Returns:
+    module: The module implementing the script.
+"""
+def loadScript(scriptPath):
+    # OBS adds the folder of the script to the module path
+    sys.path.insert(0, os.path.dirname(os.path.abspath(scriptPath)))
+
+    spec = importlib.util.spec_from_file_location("bambuLabScript", scriptPath)
+    script = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = script
+    spec.loader.exec_module(script)
+    return sys.modules[script.script_load.__module__]
+
+
+"""
+Loads a recording written by record_reports.py.
+
+Args:
+    recordingPath (str): The path of the recording.
+
+Returns:
+    list: Tuples of the receive time (seconds since the first report) and the message.
+"""
+def loadRecording(recordingPath):
+    messages = []
+    with open(recordingPath, 'r', encoding='utf-8') as recordingFile:
+        for line in recordingFile:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            messages.append((record["t"], Message(record["topic"], record["payload"].encode("utf-8"))))
+    return messages
+
+
+"""
+Creates a printer with all text sources bound.
+The model source stays unbound, so no model image is requested.
+
+Args:
+    script (module): The script.
+
+Returns:
+    dict: The printer.
+"""
+def createBenchmarkPrinter(script):
+    sources = {key: "" if key == "model" else "Benchmark " + key for key in script.sourcesName}
+    printer = script.createPrinter("Benchmark", "127.0.0.1", "00M09A350100001", "12345678", sources)
+
+    script.environment["printers"] = [printer]
+    script.environment["realtime"] = True
+    script.resetRenderedValues()
+    script.pendingUpdates.clear()
+    script.resolveSourceHandles()
+    return printer
+
+
+"""
+Gets a percentile of sorted values.
+
+Args:
+    values (list): The sorted values.
+    percent (float): The percentile.
+
+Returns:
+    float: The value.
+"""
+def percentile(values, percent):
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+"""
+Renders the latest printer state and applies the source updates like the redraw and OBS timers do.
+
+Args:
+    script (module): The script.
+    printer (dict): The printer.
+"""
+def render(script, printer):
+    script.renderLatestReport(printer)
+    script.applySourceUpdates()
+
+
+"""
+Replays a recording and times each call of onMessage() and each redraw.
+The redraws happen refreshRate times per second of recording time, or after every message if refreshRate is 0.
+
+Args:
+    script (module): The script.
+    messages (list): The recorded messages.
+    refreshRate (float): Redraws per second.
+
+Returns:
+    dict: The measured handler and render times (seconds), the wall time and the OBS calls.
+"""
+def replayTimed(script, messages, refreshRate):
+    printer = createBenchmarkPrinter(script)
+    obspython.reset()
+
+    handlerTimes = []
+    renderTimes = []
+    nextRedraw = 0
+    clock = time.perf_counter
+
+    wallStart = clock()
+    for receiveTime, message in messages:
+        start = clock()
+        script.onMessage(None, printer, message)
+        handlerTimes.append(clock() - start)
+
+        if refreshRate <= 0 or receiveTime >= nextRedraw:
+            start = clock()
+            render(script, printer)
+            renderTimes.append(clock() - start)
+            nextRedraw = receiveTime + (1 / refreshRate if refreshRate > 0 else 0)
+
+    render(script, printer)
+    wallTime = clock() - wallStart
+
+    return {
+        "handlerTimes": sorted(handlerTimes),
+        "renderTimes": sorted(renderTimes),
+        "wallTime": wallTime,
+        "obsCalls": dict(obspython.calls),
+        "printer": printer
+    }
+
+
+"""
+Replays a recording with tracemalloc and measures the peak memory allocated while handling each message.
+The redraws are included like in replayTimed().
+
+Args:
+    script (module): The script.
+    messages (list): The recorded messages.
+    refreshRate (float): Redraws per second.
+
+Returns:
+    float: The mean peak of allocated bytes per message or None if tracemalloc cannot reset the peak.
+"""
+def replayAllocations(script, messages, refreshRate):
+    # reset_peak() is available since Python 3.9
+    if not hasattr(tracemalloc, "reset_peak"):
+        return None
+
+    printer = createBenchmarkPrinter(script)
+    peaks = []
+    nextRedraw = 0
+
+    tracemalloc.start()
+    try:
+        for receiveTime, message in messages:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+
+            script.onMessage(None, printer, message)
+            if refreshRate <= 0 or receiveTime >= nextRedraw:
+                render(script, printer)
+                nextRedraw = receiveTime + (1 / refreshRate if refreshRate > 0 else 0)
+
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    return statistics.mean(peaks) if peaks else 0
+
+
+"""
+Times a function of the script with timeit.
+
+Args:
+    function: The function.
+    *args: The arguments of the function.
+
+Returns:
+    float: The time per call (seconds).
+"""
+def timeCall(function, *args):
+    timer = timeit.Timer(lambda: function(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+"""
+Times the lookup of the active tray.
+Older versions of the script, which have no AMS index yet, scan the merged report instead.
+
+Args:
+    script (module): The script.
+    printer (dict): The printer after a replay.
+
+Returns:
+    float: The time per lookup (seconds).
+"""
+def timeTrayLookup(script, printer):
+    if "amsIndex" in printer:
+        return timeCall(script.getTrayInformation, printer["printerState"], printer["amsIndex"])
+    return timeCall(script.getTrayInformation, printer["printerState"])
+
+
+"""
+Benchmarks a recording.
+
+Args:
+    script (module): The script.
+    recordingPath (str): The path of the recording.
+    refreshRate (float): Redraws per second.
+    repeat (int): Number of timed replays; the fastest replay is reported.
+
+Returns:
+    dict: The results.
+"""
+def benchmarkRecording(script, recordingPath, refreshRate, repeat):
+    messages = loadRecording(recordingPath)
+
+    # The fastest replay is the one least disturbed by the rest of the system
+    replay = min((replayTimed(script, messages, refreshRate) for _ in range(repeat)), key=lambda result: result["wallTime"])
+    printerState = replay["printer"]["printerState"]
+    messageCount = len(messages)
+
+    return {
+        "messages": messageCount,
+        "messagesPerSecond": messageCount / replay["wallTime"] if replay["wallTime"] else 0,
+        "handlerP50": percentile(replay["handlerTimes"], 50),
+        "handlerP99": percentile(replay["handlerTimes"], 99),
+        "renders": len(replay["renderTimes"]) + 1,
+        "renderP50": percentile(replay["renderTimes"], 50),
+        "renderP99": percentile(replay["renderTimes"], 99),
+        "peakBytesPerMessage": replayAllocations(script, messages, refreshRate),
+        "sourceUpdatesPerMessage": replay["obsCalls"].get("obs_source_update", 0) / messageCount,
+        "obsDataCreatesPerMessage": replay["obsCalls"].get("obs_data_create", 0) / messageCount,
+        "getTrayInformation": timeTrayLookup(script, replay["printer"]),
+        "formatTime": timeCall(script.formatTime, printerState.get("mc_remaining_time", 0))
+    }
+
+
+"""
+Prints the results as a table.
+
+Args:
+    results (dict): The results keyed by recording name.
+"""
+def printResults(results):
+    columns = ("recording", "msgs", "msg/s", "p50 us", "p99 us", "renders", "render p99 us",
+               "peak KiB/msg", "updates/msg", "obs_data/msg", "tray ns", "formatTime ns")
+    rows = [columns]
+
+    for name, result in results.items():
+        peak = result["peakBytesPerMessage"]
+        rows.append((
+            name,
+            str(result["messages"]),
+            f'{result["messagesPerSecond"]:.0f}',
+            f'{result["handlerP50"] * 1e6:.1f}',
+            f'{result["handlerP99"] * 1e6:.1f}',
+            str(result["renders"]),
+            f'{result["renderP99"] * 1e6:.1f}',
+            "n/a" if peak is None else f'{peak / 1024:.1f}',
+            f'{result["sourceUpdatesPerMessage"]:.2f}',
+            f'{result["obsDataCreatesPerMessage"]:.2f}',
+            f'{result["getTrayInformation"] * 1e9:.0f}',
+            f'{result["formatTime"] * 1e9:.0f}'
+        ))
+
+    widths = [max(len(row[index]) for row in rows) for index in range(len(columns))]
+    for row in rows:
+        print("  ".join(value.ljust(width) if index == 0 else value.rjust(width) for index, (value, width) in enumerate(zip(row, widths))))
+
+
+"""
+Compares the results with saved results.
+
+Args:
+    results (dict): The results keyed by recording name.
+    baseline (dict): The saved results keyed by recording name.
+    tolerance (float): Allowed relative degradation of each metric.
+
+Returns:
+    list: Descriptions of the metrics which degraded by more than the tolerance.
+"""
+def compareResults(results, baseline, tolerance):
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        for metric, higherIsBetter in comparedMetrics.items():
+            value = result.get(metric)
+            baseValue = baseline[name].get(metric)
+            if value is None or not baseValue:
+                continue
+
+            change = (value - baseValue) / baseValue
+            if (-change if higherIsBetter else change) > tolerance:
+                regressions.append(f"{name} {metric}: {baseValue:.6g} -> {value:.6g} ({change:+.0%})")
+
+    return regressions
+
+
+"""
+Gets the recordings to replay.
+
+Args:
+    paths (list): Recording files or folders of recordings.
+
+Returns:
+    list: The paths of the recording files.
+"""
+def findRecordings(paths):
+    recordings = []
+    for path in paths:
+        if os.path.isdir(path):
+            recordings.extend(sorted(os.path.join(path, fileName) for fileName in os.listdir(path) if fileName.endswith(".jsonl")))
+        else:
+            recordings.append(path)
+    return recordings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays recorded printer reports through the report pipeline of the OBS script.")
+    parser.add_argument("recordings", nargs="*", default=[defaultRecordingsPath], help="recording files or folders (default: the bundled recordings)")
+    parser.add_argument("--script", default=defaultScriptPath, help="path of the OBS script (default: obsBambuLabX1Cmqtt311.py)")
+    parser.add_argument("--refresh-rate", type=float, default=1, help="redraws per second of recording time; 0 redraws after every message (default: 1)")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed replays per recording (default: 5)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with a JSON file written by --save and fail on regressions")
+    parser.add_argument("--profile", help="enable the profiling of the script and export the recorded trace to this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative degradation for --compare (default: 0.2)")
+    args = parser.parse_args()
+
+    script = loadScript(args.script)
+    script.profilingEnabled = bool(args.profile)
+    print(f"Script: {os.path.basename(args.script)}, JSON decoder: {script.jsonDecoderName}, "
+          f"Python {sys.version.split()[0]}, refresh rate: {args.refresh_rate} Hz")
+
+    results = {}
+    for recordingPath in findRecordings(args.recordings):
+        results[os.path.splitext(os.path.basename(recordingPath))[0]] = benchmarkRecording(script, recordingPath, args.refresh_rate, args.repeat)
+
+    printResults(results)
+
+    if args.profile:
+        print(f"Profiling trace with {script.exportProfile(args.profile)} stages written to {args.profile}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as resultFile:
+            json.dump(results, resultFile, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as baselineFile:
+            regressions = compareResults(results, json.load(baselineFile), args.tolerance)
+
+        for regression in regressions:
+            print("Regression:", regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
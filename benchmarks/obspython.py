@@ -0,0 +1,110 @@
+# Stub of the OBS python module for running the script outside of OBS
+# Description: Every call is counted in calls; sources and settings are plain objects, calldata is a dict
+
+import collections
+
+OBS_TEXT_DEFAULT = 0
+OBS_TEXT_PASSWORD = 1
+OBS_TEXT_INFO = 2
+OBS_PATH_FILE = 0
+OBS_PATH_FILE_SAVE = 1
+OBS_PATH_DIRECTORY = 2
+OBS_COMBO_TYPE_EDITABLE = 1
+OBS_COMBO_FORMAT_STRING = 3
+
+# Number of calls of each OBS function
+calls = collections.Counter()
+
+
+class Source:
+    """Source returned by obs_get_source_by_name(); keeps the settings of the last update."""
+    def __init__(self, name):
+        self.name = name
+        self.settings = {}
+
+
+class Data:
+    """Settings object returned by obs_data_create()."""
+    def __init__(self):
+        self.values = {}
+
+
+"""
+Resets the call counters.
+"""
+def reset():
+    calls.clear()
+
+
+def obs_get_source_by_name(name):
+    calls["obs_get_source_by_name"] += 1
+    return Source(name)
+
+
+def obs_source_get_name(source):
+    calls["obs_source_get_name"] += 1
+    return source.name
+
+
+def obs_source_update(source, settings):
+    calls["obs_source_update"] += 1
+    source.settings.update(settings.values)
+
+
+def obs_data_create():
+    calls["obs_data_create"] += 1
+    return Data()
+
+
+def obs_data_set_string(settings, name, value):
+    calls["obs_data_set_string"] += 1
+    settings.values[name] = value
+
+
+def obs_data_set_int(settings, name, value):
+    calls["obs_data_set_int"] += 1
+    settings.values[name] = value
+
+
+def obs_enum_sources():
+    calls["obs_enum_sources"] += 1
+    return []
+
+
+def calldata_source(calldata, name):
+    calls["calldata_source"] += 1
+    return calldata.get(name)
+
+
+def calldata_string(calldata, name):
+    calls["calldata_string"] += 1
+    return calldata.get(name)
+
+
+"""
+Creates a stub of an OBS function which only counts its calls.
+
+Args:
+    name (str): The name of the function.
+
+Returns:
+    function: The stub.
+"""
+def countedFunction(name):
+    def function(*args, **kwargs):
+        calls[name] += 1
+
+    function.__name__ = name
+    return function
+
+
+# All other OBS functions used by the script only count their calls
+# (defined explicitly, a module level __getattr__ requires Python 3.7)
+for functionName in ("obs_data_get_bool", "obs_data_get_double", "obs_data_get_int",
+                     "obs_data_get_string", "obs_data_release", "obs_data_set_default_bool", "obs_data_set_default_double",
+                     "obs_data_set_default_int", "obs_get_signal_handler", "obs_properties_add_bool", "obs_properties_add_button",
+                     "obs_properties_add_float", "obs_properties_add_int", "obs_properties_add_list", "obs_properties_add_path",
+                     "obs_properties_add_text", "obs_properties_create", "obs_property_list_add_string",
+                     "obs_source_get_unversioned_id", "obs_source_release", "signal_handler_connect", "signal_handler_disconnect",
+                     "source_list_release", "timer_add", "timer_remove"):
+    globals()[functionName] = countedFunction(functionName)
@@ -0,0 +1,688 @@
+# Simulator of BambuLab X1C printers for load and latency tests of the OBS script
+# Description: Serves the printer reports via MQTT over TLS and the print files via implicit FTPS for N virtual printers
+
+import argparse
+import asyncio
+import datetime
+import io
+import ipaddress
+import json
+import os
+import random
+import ssl
+import struct
+import subprocess
+import tempfile
+import time
+import zipfile
+import zlib
+
+# MQTT packet types
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+# CONNACK return code for a wrong access code
+connackNotAuthorized = 5
+
+# Colors of the model images and AMS trays of the virtual printers
+simulatorColors = ["FFFFFFFF", "000000FF", "F72323FF", "0A2989FF", "FFD00BFF", "00AE42FF", "8E9089FF", "F4EE2AFF",
+                   "C12E1FFF", "5E43B7FF", "FF6A13FF", "9D2235FF", "AF7933FF", "F95D73FF", "56B7E6FF", "D3B7A7FF"]
+simulatorTrayTypes = ["PLA", "PETG", "ABS", "TPU", "PLA-S", "ASA", "PA-CF", "PLA"]
+
+
+"""
+Logs the given message with a timestamp.
+"""
+def log(*args, **kwargs):
+    current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{current_time}]", *args, **kwargs)
+
+
+"""
+Creates a PNG image of a single color.
+
+Args:
+    width (int): The width of the image.
+    height (int): The height of the image.
+    color (str): The color as RRGGBB hex string.
+
+Returns:
+    bytes: The PNG file.
+"""
+def createPng(width, height, color):
+    def chunk(chunkType, data):
+        return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data) & 0xFFFFFFFF)
+
+    row = b"\x00" + bytes.fromhex(color[:6]) * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(row * height)) + chunk(b"IEND", b"")
+
+
+"""
+Creates a 3mf file with a model image for each plate.
+
+Args:
+    plateCount (int): The number of plates.
+    color (str): The color of the model images as RRGGBB hex string.
+    modelSize (int): The size of the gcode entry in bytes, which makes up most of the file.
+
+Returns:
+    bytes: The 3mf file.
+"""
+def create3mf(plateCount, color, modelSize):
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w') as modelZipObject:
+        modelZipObject.writestr("[Content_Types].xml", '<?xml version="1.0" encoding="UTF-8"?><Types/>')
+        modelZipObject.writestr("3D/3dmodel.model", '<?xml version="1.0" encoding="UTF-8"?><model unit="millimeter"/>')
+
+        # Printed gcode is not compressible by much, so random bytes stand in for it
+        modelZipObject.writestr("Metadata/plate_1.gcode", os.urandom(modelSize), compress_type=zipfile.ZIP_STORED)
+
+        for plate in range(1, plateCount + 1):
+            modelZipObject.writestr(f"Metadata/plate_{plate}.png", createPng(256, 256, color))
+
+    return output.getvalue()
+
+
+"""
+Creates the TLS context of the servers.
+Without a certificate, a self-signed one is created with openssl like the printers use.
+
+Args:
+    certFile (str): The path of the certificate or None.
+    keyFile (str): The path of the private key or None.
+
+Returns:
+    ssl.SSLContext: The context.
+"""
+def createServerContext(certFile, keyFile):
+    if certFile is None:
+        certFolderPath = tempfile.mkdtemp(prefix="printerSimulator")
+        certFile = os.path.join(certFolderPath, "printer.crt")
+        keyFile = os.path.join(certFolderPath, "printer.key")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "365",
+                        "-subj", "/CN=BBL Simulated Printer", "-keyout", keyFile, "-out", certFile],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certFile, keyFile)
+    return context
+
+
+"""
+Encodes the remaining length of an MQTT packet.
+
+Args:
+    length (int): The length.
+
+Returns:
+    bytes: The encoded length.
+"""
+def encodeLength(length):
+    encoded = bytearray()
+    while True:
+        digit = length % 128
+        length //= 128
+        encoded.append(digit | 0x80 if length > 0 else digit)
+        if length == 0:
+            return bytes(encoded)
+
+
+"""
+Encodes an MQTT packet.
+
+Args:
+    packetType (int): The packet type.
+    flags (int): The flags of the fixed header.
+    body (bytes): The variable header and payload.
+
+Returns:
+    bytes: The packet.
+"""
+def encodePacket(packetType, flags, body):
+    return bytes([packetType << 4 | flags]) + encodeLength(len(body)) + body
+
+
+"""
+Encodes an MQTT string.
+
+Args:
+    text (str): The string.
+
+Returns:
+    bytes: The encoded string.
+"""
+def encodeString(text):
+    data = text.encode("utf-8")
+    return struct.pack(">H", len(data)) + data
+
+
+"""
+Reads an MQTT packet.
+
+Args:
+    reader (asyncio.StreamReader): The reader of the connection.
+
+Returns:
+    tuple: The packet type, the flags and the body.
+"""
+async def readPacket(reader):
+    header = (await reader.readexactly(1))[0]
+
+    length = 0
+    multiplier = 1
+    while True:
+        digit = (await reader.readexactly(1))[0]
+        length += (digit & 0x7F) * multiplier
+        if not digit & 0x80:
+            break
+        multiplier *= 128
+
+    return header >> 4, header & 0x0F, await reader.readexactly(length)
+
+
+"""
+Decodes an MQTT string.
+
+Args:
+    body (bytes): The packet body.
+    offset (int): The offset of the string.
+
+Returns:
+    tuple: The string and the offset behind it.
+"""
+def decodeString(body, offset):
+    length = struct.unpack_from(">H", body, offset)[0]
+    return body[offset + 2:offset + 2 + length].decode("utf-8"), offset + 2 + length
+
+
+class VirtualPrinter:
+    """Virtual X1C with an MQTT broker publishing its reports and an implicit FTPS server for its print files."""
+    def __init__(self, index, address, args):
+        self.index = index
+        self.address = address
+        self.serialNumber = f"00M09A35010{index:04d}"
+        self.accessCode = args.access_code
+        self.args = args
+        self.subscribers = set() # Writers of the MQTT connections subscribed to the report topic
+        self.files = {} # Files served via FTP keyed by path
+        self.fileTimes = {} # Modification times of the files
+        self.statistics = {"reports": 0, "reportBytes": 0, "ftpBytes": 0, "mqttConnections": 0, "ftpConnections": 0}
+        self.recording = loadRecordingPayloads(args.recording) if args.recording else None
+        self.sequenceId = 0
+        self.state = self.createState()
+        self.startTask()
+
+    def createState(self):
+        """Creates the state of a print; most of its keys are sent with the full report only."""
+        units = self.args.ams_units
+        return {
+            "nozzle_temper": 220.0, "nozzle_target_temper": 220.0, "bed_temper": 65.0, "bed_target_temper": 65.0,
+            "chamber_temper": 31, "mc_percent": 0, "mc_remaining_time": 120, "layer_num": 1, "total_layer_num": 240,
+            "nozzle_type": "hardened_steel", "nozzle_diameter": "0.4", "gcode_state": "RUNNING", "print_type": "local",
+            "wifi_signal": "-45dBm", "cooling_fan_speed": "15", "heatbreak_fan_speed": "15",
+            "ams": {
+                "ams": [{"id": str(unit), "humidity": "4", "temp": "25.0",
+                         "tray": [{"id": str(slot), "remain": random.randint(10, 100), "tray_type": simulatorTrayTypes[(unit * 4 + slot) % len(simulatorTrayTypes)],
+                                   "tray_color": simulatorColors[(unit * 4 + slot) % len(simulatorColors)], "tray_diameter": "1.75",
+                                   "tray_temp": "55", "nozzle_temp_max": "230", "nozzle_temp_min": "190", "k": 0.02, "n": 1}
+                                  for slot in range(4)]}
+                        for unit in range(units)],
+                "ams_exist_bits": "%x" % ((1 << units) - 1),
+                "tray_exist_bits": "%x" % ((1 << 4 * units) - 1),
+                "tray_now": "0" if units else "254",
+                "tray_tar": "0" if units else "254",
+                "version": 1
+            },
+            "vt_tray": {"id": "254", "tray_type": "PETG", "tray_color": "00AE42FF", "tray_diameter": "1.75"},
+            "lights_report": [{"mode": "on", "node": "chamber_light"}],
+            "upgrade_state": {"status": "IDLE", "progress": "0", "message": "0%, 0B/s"}
+        }
+
+    def startTask(self):
+        """Starts a new print task with a new 3mf file on the FTP server."""
+        taskNumber = random.randint(100000000, 999999999)
+        plate = random.randint(1, self.args.plates)
+        subtaskName = f"Simulated part {taskNumber}"
+
+        self.state.update({
+            "task_id": str(taskNumber),
+            "subtask_id": str(taskNumber),
+            "subtask_name": subtaskName,
+            "gcode_file": f"/data/Metadata/plate_{plate}.gcode",
+            "mc_percent": 0,
+            "layer_num": 1,
+            "mc_remaining_time": 120
+        })
+
+        # The printer keeps cloud and local prints in the cache folder and prints from the SD card otherwise
+        modelFile = create3mf(self.args.plates, simulatorColors[self.index % len(simulatorColors)], self.args.model_size * 1024 * 1024)
+        self.files = {"cache/" + subtaskName + ".3mf": modelFile, subtaskName + ".gcode.3mf": modelFile}
+        self.fileTimes = {path: time.gmtime() for path in self.files}
+
+    def nextSequenceId(self):
+        self.sequenceId += 1
+        return str(self.sequenceId)
+
+    def fullReport(self):
+        """Creates a full report like the printer sends it on pushall."""
+        nodePrint = dict(self.state, command="push_status", msg=0, sequence_id=self.nextSequenceId())
+        return {"print": nodePrint}
+
+    def deltaReport(self):
+        """Advances the print and creates a delta report with the changed keys."""
+        state = self.state
+        delta = {"command": "push_status", "msg": 1, "sequence_id": self.nextSequenceId()}
+
+        state["nozzle_temper"] = round(state["nozzle_target_temper"] + random.uniform(-0.6, 0.6), 1)
+        state["bed_temper"] = round(state["bed_target_temper"] + random.uniform(-0.3, 0.3), 1)
+        delta["nozzle_temper"] = state["nozzle_temper"]
+        delta["bed_temper"] = state["bed_temper"]
+
+        if random.random() < 0.3:
+            state["wifi_signal"] = "%ddBm" % random.randint(-60, -40)
+            delta["wifi_signal"] = state["wifi_signal"]
+
+        if random.random() < 0.05:
+            state["layer_num"] = min(state["total_layer_num"], state["layer_num"] + 1)
+            state["mc_percent"] = min(100, state["mc_percent"] + 1)
+            state["mc_remaining_time"] = max(0, state["mc_remaining_time"] - 1)
+            state["chamber_temper"] = random.choice([31, 32])
+            for key in ("layer_num", "mc_percent", "mc_remaining_time", "chamber_temper"):
+                delta[key] = state[key]
+
+        if state["ams"]["ams"] and random.random() < self.args.ams_activity:
+            unit = random.choice(state["ams"]["ams"])
+            unit["humidity"] = str(random.randint(2, 5))
+            tray = random.choice(unit["tray"])
+            tray["remain"] = max(0, tray["remain"] - 1)
+            amsDelta = {"ams": [{"id": unit["id"], "humidity": unit["humidity"], "tray": [{"id": tray["id"], "remain": tray["remain"]}]}]}
+
+            # Filament change to a tray of any AMS unit
+            if random.random() < 0.1:
+                trayNow = str(random.randrange(4 * len(state["ams"]["ams"])))
+                state["ams"]["tray_now"] = state["ams"]["tray_tar"] = trayNow
+                amsDelta["tray_now"] = amsDelta["tray_tar"] = trayNow
+
+            delta["ams"] = amsDelta
+
+        return {"print": delta}
+
+    async def publish(self, report):
+        """Sends a report to all subscribed MQTT connections."""
+        # The send time allows the receiver to measure the latency; the script ignores unknown keys
+        if "print" in report:
+            report["print"]["simulator_time"] = time.time()
+
+        payload = json.dumps(report, separators=(",", ":")).encode("utf-8")
+        packet = encodePacket(PUBLISH, 0, encodeString("device/" + self.serialNumber + "/report") + payload)
+
+        for writer in list(self.subscribers):
+            try:
+                writer.write(packet)
+                await writer.drain()
+            except ConnectionError:
+                self.subscribers.discard(writer)
+                continue
+            self.statistics["reports"] += 1
+            self.statistics["reportBytes"] += len(payload)
+
+    async def runReports(self):
+        """Publishes delta reports at the configured rate, full reports periodically and new tasks if configured."""
+        interval = 1 / self.args.rate
+        lastPushall = lastTask = time.monotonic()
+
+        # Recordings are replayed in a loop at the configured rate
+        if self.recording:
+            while True:
+                for payload in self.recording:
+                    await self.publish(json.loads(payload))
+                    await asyncio.sleep(interval)
+
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+
+            if self.args.task_interval and now - lastTask >= self.args.task_interval:
+                lastTask = now
+                self.startTask()
+                await self.publish(self.fullReport())
+                continue
+
+            if self.args.pushall_interval and now - lastPushall >= self.args.pushall_interval:
+                lastPushall = now
+                await self.publish(self.fullReport())
+                continue
+
+            await self.publish(self.deltaReport())
+
+    async def handleMqtt(self, reader, writer):
+        """Serves an MQTT connection."""
+        self.statistics["mqttConnections"] += 1
+        try:
+            packetType, _, body = await readPacket(reader)
+            if packetType != CONNECT:
+                return
+
+            # Variable header: protocol name, level, flags and keep alive; payload: client id, will, user name, password
+            _, offset = decodeString(body, 0)
+            connectFlags = body[offset + 1]
+            offset += 4
+            _, offset = decodeString(body, offset)
+            if connectFlags & 0x04:
+                _, offset = decodeString(body, offset)
+                _, offset = decodeString(body, offset)
+            userName = password = None
+            if connectFlags & 0x80:
+                userName, offset = decodeString(body, offset)
+            if connectFlags & 0x40:
+                password, offset = decodeString(body, offset)
+
+            if userName != "bblp" or password != self.accessCode:
+                writer.write(encodePacket(CONNACK, 0, bytes([0, connackNotAuthorized])))
+                await writer.drain()
+                return
+
+            writer.write(encodePacket(CONNACK, 0, bytes([0, 0])))
+            await writer.drain()
+
+            while True:
+                packetType, flags, body = await readPacket(reader)
+
+                if packetType == SUBSCRIBE:
+                    packetId = body[:2]
+                    offset = 2
+                    grantedQos = bytearray()
+                    while offset < len(body):
+                        topic, offset = decodeString(body, offset)
+                        offset += 1
+                        grantedQos.append(0)
+                        if topic == "device/" + self.serialNumber + "/report":
+                            self.subscribers.add(writer)
+                    writer.write(encodePacket(SUBACK, 0, packetId + bytes(grantedQos)))
+                    if writer in self.subscribers:
+                        writer.write(encodePacket(PUBLISH, 0, encodeString("device/" + self.serialNumber + "/report")
+                                                  + json.dumps(self.fullReport(), separators=(",", ":")).encode("utf-8")))
+
+                elif packetType == UNSUBSCRIBE:
+                    self.subscribers.discard(writer)
+                    writer.write(encodePacket(UNSUBACK, 0, body[:2]))
+
+                elif packetType == PUBLISH:
+                    topic, offset = decodeString(body, 0)
+                    qos = (flags >> 1) & 0x03
+                    if qos:
+                        writer.write(encodePacket(PUBACK, 0, body[offset:offset + 2]))
+                        offset += 2
+                    await self.handleRequest(topic, body[offset:])
+
+                elif packetType == PINGREQ:
+                    writer.write(encodePacket(PINGRESP, 0, b""))
+
+                elif packetType == DISCONNECT:
+                    return
+
+                await writer.drain()
+
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    async def handleRequest(self, topic, payload):
+        """Answers a pushall request with a full report."""
+        if topic != "device/" + self.serialNumber + "/request":
+            return
+
+        try:
+            command = json.loads(payload).get("pushing", {}).get("command", "")
+        except ValueError:
+            return
+
+        if command == "pushall":
+            await self.publish(self.fullReport())
+
+    async def handleFtp(self, reader, writer):
+        """Serves an implicit FTPS control connection."""
+        self.statistics["ftpConnections"] += 1
+        loggedIn = False
+        userName = None
+        restOffset = 0
+        dataConnection = None
+
+        async def reply(line):
+            writer.write((line + "\r\n").encode("utf-8"))
+            await writer.drain()
+
+        try:
+            await reply("220 Simulated X1C FTP server ready")
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+
+                command, _, argument = line.decode("utf-8").rstrip("\r\n").partition(" ")
+                command = command.upper()
+
+                if command == "USER":
+                    userName = argument
+                    await reply("331 Password required")
+                elif command == "PASS":
+                    loggedIn = userName == "bblp" and argument == self.accessCode
+                    await reply("230 Logged in" if loggedIn else "530 Login incorrect")
+                elif command == "QUIT":
+                    await reply("221 Goodbye")
+                    return
+                elif not loggedIn:
+                    await reply("530 Please login with USER and PASS")
+                elif command in ("PBSZ", "PROT", "TYPE"):
+                    await reply("200 OK")
+                elif command == "NOOP":
+                    await reply("200 NOOP ok")
+                elif command == "SIZE":
+                    if argument in self.files:
+                        await reply(f"213 {len(self.files[argument])}")
+                    else:
+                        await reply("550 File not found")
+                elif command == "MDTM":
+                    if argument in self.fileTimes:
+                        await reply("213 " + time.strftime("%Y%m%d%H%M%S", self.fileTimes[argument]))
+                    else:
+                        await reply("550 File not found")
+                elif command == "REST":
+                    restOffset = int(argument)
+                    await reply(f"350 Restarting at {restOffset}")
+                elif command == "PASV":
+                    dataConnection = await self.openDataConnection()
+                    host = self.address.replace(".", ",")
+                    port = dataConnection["port"]
+                    await reply(f"227 Entering Passive Mode ({host},{port >> 8},{port & 0xFF})")
+                elif command == "RETR":
+                    if argument not in self.files:
+                        await reply("550 File not found")
+                    elif dataConnection is None:
+                        await reply("425 Use PASV first")
+                    else:
+                        await reply("150 Opening BINARY mode data connection")
+                        completed = await self.sendFile(dataConnection, self.files[argument][restOffset:])
+                        await reply("226 Transfer complete" if completed else "426 Connection closed; transfer aborted")
+                    restOffset = 0
+                    dataConnection = None
+                else:
+                    await reply("502 Command not implemented")
+
+        except (ConnectionError, ssl.SSLError, UnicodeDecodeError, ValueError):
+            pass
+        finally:
+            if dataConnection is not None:
+                dataConnection["server"].close()
+            writer.close()
+
+    async def openDataConnection(self):
+        """Listens for the passive data connection of a transfer."""
+        connected = asyncio.get_event_loop().create_future()
+
+        def onConnection(reader, writer):
+            if not connected.done():
+                connected.set_result(writer)
+            else:
+                writer.close()
+
+        server = await asyncio.start_server(onConnection, self.address, 0, ssl=self.args.context)
+        return {"server": server, "port": server.sockets[0].getsockname()[1], "connected": connected}
+
+    async def sendFile(self, dataConnection, data):
+        """Sends a file over the data connection, limited to the configured bandwidth."""
+        try:
+            writer = await asyncio.wait_for(dataConnection["connected"], 30)
+        except asyncio.TimeoutError:
+            dataConnection["server"].close()
+            return False
+        dataConnection["server"].close()
+
+        blockSize = 65536
+        bandwidth = self.args.ftp_bandwidth * 1024 * 1024
+        completed = True
+        try:
+            for offset in range(0, len(data), blockSize):
+                # The client closes the data connection early when it only needs a part of the file
+                if writer.transport.is_closing():
+                    completed = False
+                    break
+
+                block = data[offset:offset + blockSize]
+                writer.write(block)
+                await writer.drain()
+                self.statistics["ftpBytes"] += len(block)
+                if bandwidth:
+                    await asyncio.sleep(len(block) / bandwidth)
+        except (ConnectionError, ssl.SSLError):
+            completed = False
+        finally:
+            writer.close()
+
+        return completed
+
+    async def start(self):
+        """Starts the MQTT and FTP servers of the printer."""
+        mqttServer = await asyncio.start_server(self.handleMqtt, self.address, self.args.mqtt_port, ssl=self.args.context)
+        ftpServer = await asyncio.start_server(self.handleFtp, self.address, self.args.ftp_port, ssl=self.args.context)
+        return [mqttServer, ftpServer]
+
+
+"""
+Loads the payloads of a recording written by record_reports.py.
+
+Args:
+    recordingPath (str): The path of the recording.
+
+Returns:
+    list: The payloads.
+"""
+def loadRecordingPayloads(recordingPath):
+    with open(recordingPath, 'r', encoding='utf-8') as recordingFile:
+        return [json.loads(line)["payload"] for line in recordingFile if line.strip()]
+
+
+"""
+Writes the printers file for the OBS script with the virtual printers.
+
+Args:
+    printers (list): The virtual printers.
+    printersFile (str): The path of the file.
+"""
+def writePrintersFile(printers, printersFile):
+    printerConfigs = [{
+        "name": f"Simulated X1C {printer.index + 1}",
+        "host": printer.address,
+        "accessCode": printer.accessCode,
+        "serialNumber": printer.serialNumber,
+        "sources": {}
+    } for printer in printers]
+
+    with open(printersFile, 'w', encoding='utf-8') as printerFile:
+        json.dump(printerConfigs, printerFile, indent=4)
+
+
+"""
+Logs the statistics of all printers periodically.
+
+Args:
+    printers (list): The virtual printers.
+    interval (float): The interval in seconds.
+"""
+async def logStatisticsPeriodically(printers, interval):
+    while True:
+        await asyncio.sleep(interval)
+        totals = {key: sum(printer.statistics[key] for printer in printers) for key in printers[0].statistics}
+        log(f'Reports sent: {totals["reports"]} ({totals["reportBytes"] / 1024:.0f} KiB), '
+            f'FTP sent: {totals["ftpBytes"] / 1024 / 1024:.1f} MiB, '
+            f'connections MQTT: {totals["mqttConnections"]}, FTP: {totals["ftpConnections"]}')
+
+
+async def runSimulator(args):
+    baseAddress = ipaddress.IPv4Address(args.address)
+    printers = [VirtualPrinter(index, str(baseAddress + index), args) for index in range(args.printers)]
+
+    servers = []
+    for printer in printers:
+        servers.extend(await printer.start())
+        log(f"Printer {printer.serialNumber} at {printer.address}: MQTT {args.mqtt_port}, FTPS {args.ftp_port}, access code {printer.accessCode}")
+
+    if args.printers_file:
+        writePrintersFile(printers, args.printers_file)
+        log("Printers file written to", args.printers_file)
+
+    tasks = [asyncio.ensure_future(printer.runReports()) for printer in printers]
+    tasks.append(asyncio.ensure_future(logStatisticsPeriodically(printers, args.statistics_interval)))
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for server in servers:
+            server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulates BambuLab X1C printers serving reports via MQTT over TLS and print files via implicit FTPS.")
+    parser.add_argument("--printers", type=int, default=1, help="number of virtual printers (default: 1)")
+    parser.add_argument("--address", default="127.0.0.1", help="address of the first printer; the others use the following addresses (default: 127.0.0.1)")
+    parser.add_argument("--mqtt-port", type=int, default=8883, help="MQTT port (default: 8883)")
+    parser.add_argument("--ftp-port", type=int, default=990, help="FTPS port (default: 990)")
+    parser.add_argument("--access-code", default="12345678", help="access code of the printers (default: 12345678)")
+    parser.add_argument("--rate", type=float, default=1, help="reports per second of each printer (default: 1)")
+    parser.add_argument("--pushall-interval", type=float, default=300, help="seconds between full reports; 0 sends them only on request (default: 300)")
+    parser.add_argument("--task-interval", type=float, default=0, help="seconds between new print tasks; 0 keeps the first task (default: 0)")
+    parser.add_argument("--ams-units", type=int, default=1, choices=range(0, 5), help="AMS units of each printer (default: 1)")
+    parser.add_argument("--ams-activity", type=float, default=0.2, help="share of the reports with AMS changes (default: 0.2)")
+    parser.add_argument("--plates", type=int, default=2, help="plates in the 3mf files (default: 2)")
+    parser.add_argument("--model-size", type=int, default=8, help="size of the 3mf files in MB (default: 8)")
+    parser.add_argument("--ftp-bandwidth", type=float, default=0, help="FTP bandwidth per transfer in MB/s; 0 is unlimited (default: 0)")
+    parser.add_argument("--recording", help="replay the payloads of this recording instead of synthetic reports")
+    parser.add_argument("--printers-file", help="write a printers file for the OBS script with the virtual printers")
+    parser.add_argument("--statistics-interval", type=float, default=10, help="seconds between the logged statistics (default: 10)")
+    parser.add_argument("--certfile", help="certificate of the servers (default: a new self-signed certificate)")
+    parser.add_argument("--keyfile", help="private key of the certificate")
+    args = parser.parse_args()
+
+    args.context = createServerContext(args.certfile, args.keyfile)
+
+    try:
+        asyncio.get_event_loop().run_until_complete(runSimulator(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Recorder of printer reports for the benchmarks
+# Description: Writes the reports of a BambuLab printer to a recording that bench_pipeline.py can replay
+
+import argparse
+import json
+import ssl
+import time
+
+import paho.mqtt.client as mqtt
+
+
+"""
+Creates the MQTT client for paho-mqtt 1.x and 2.x.
+
+Returns:
+    mqtt.Client: The client.
+"""
+def createClient():
+    if hasattr(mqtt, "CallbackAPIVersion"):
+        return mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
+    return mqtt.Client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Records the reports of a BambuLab printer to a JSON lines file.")
+    parser.add_argument("host", help="host address of the printer")
+    parser.add_argument("serialNumber", help="serial number of the printer")
+    parser.add_argument("accessCode", help="access code of the printer")
+    parser.add_argument("output", help="path of the recording")
+    parser.add_argument("--duration", type=float, default=300, help="recording time in seconds (default: 300)")
+    parser.add_argument("--pushall", action="store_true", help="request a full report when the recording starts")
+    args = parser.parse_args()
+
+    reportTopic = "device/" + args.serialNumber + "/report"
+    startTime = None
+    messageCount = 0
+
+    with open(args.output, 'w', encoding='utf-8') as recordingFile:
+
+        def onConnect(mqttClient, userdata, flags, rc):
+            mqttClient.subscribe(reportTopic)
+            if args.pushall:
+                mqttClient.publish("device/" + args.serialNumber + "/request",
+                                   json.dumps({"pushing": {"sequence_id": "0", "command": "pushall"}}))
+
+        def onMessage(mqttClient, userdata, msg):
+            nonlocal startTime, messageCount
+
+            receiveTime = time.monotonic()
+            if startTime is None:
+                startTime = receiveTime
+
+            record = {"t": round(receiveTime - startTime, 3), "topic": msg.topic, "payload": msg.payload.decode("utf-8")}
+            recordingFile.write(json.dumps(record, separators=(",", ":")) + "\n")
+            messageCount += 1
+
+        mqttClient = createClient()
+        mqttClient.username_pw_set("bblp", args.accessCode)
+        mqttClient.on_connect = onConnect
+        mqttClient.on_message = onMessage
+        mqttClient.tls_set(cert_reqs=ssl.CERT_NONE)
+        mqttClient.connect(args.host, 8883, 60)
+
+        endTime = time.monotonic() + args.duration
+        while time.monotonic() < endTime:
+            mqttClient.loop(timeout=1)
+
+        mqttClient.disconnect()
+
+    print(f"Recorded {messageCount} reports to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
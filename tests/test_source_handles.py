@@ -0,0 +1,81 @@
+# Tests of the held source references of the OBS script
+# Description: Runs the script against the obspython stub of the benchmarks and fires the OBS source signals
+
+import os
+import sys
+import unittest
+
+repositoryPath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repositoryPath, "benchmarks"))
+
+import bench_pipeline
+import obspython
+
+script = bench_pipeline.loadScript(os.path.join(repositoryPath, "obsBambuLabX1Cmqtt311.py"))
+
+
+class SourceSignalTest(unittest.TestCase):
+    """A source removed, recreated or renamed under a bound name gets the rendered values again."""
+    sourceName = "Test nozzleType"
+
+    def setUp(self):
+        script.releaseSourceHandles()
+        script.resetRenderedValues()
+        script.pendingUpdates.clear()
+        obspython.reset()
+
+    def render(self, value):
+        """Queues a value like a redraw and applies it like the OBS timer."""
+        script.setSourceValue(self.sourceName, value)
+        script.applySourceUpdates()
+        return script.getSourceHandle(self.sourceName)
+
+    def assertRendered(self, source, value, updates):
+        self.assertEqual(source.settings.get("text"), value)
+        self.assertEqual(obspython.calls["obs_source_update"], updates)
+
+    def test_unchanged_value_skipped(self):
+        source = self.render("0.4 mm Hardened steel")
+        self.render("0.4 mm Hardened steel")
+        self.assertRendered(source, "0.4 mm Hardened steel", 1)
+
+    def test_source_recreated(self):
+        oldSource = self.render("0.4 mm Hardened steel")
+
+        # The stub returns a new source for the next lookup, like OBS after switching the scene collection
+        script.onSourceSignal({"source": oldSource})
+        newSource = self.render("0.4 mm Hardened steel")
+
+        self.assertIsNot(newSource, oldSource)
+        self.assertRendered(newSource, "0.4 mm Hardened steel", 2)
+
+    def test_source_recreated_without_redraw(self):
+        oldSource = self.render("0.4 mm Hardened steel")
+
+        # Static values are not rendered again by the printer, the invalidated value is queued again
+        script.onSourceSignal({"source": oldSource})
+        script.applySourceUpdates()
+
+        self.assertRendered(script.getSourceHandle(self.sourceName), "0.4 mm Hardened steel", 2)
+
+    def test_source_renamed(self):
+        oldSource = self.render("0.4 mm Hardened steel")
+
+        script.onSourceSignal({"prev_name": "Other source", "new_name": self.sourceName})
+        newSource = self.render("0.4 mm Hardened steel")
+
+        self.assertIsNot(newSource, oldSource)
+        self.assertRendered(newSource, "0.4 mm Hardened steel", 2)
+
+    def test_newer_value_kept(self):
+        oldSource = self.render("0.4 mm Hardened steel")
+
+        script.setSourceValue(self.sourceName, "0.6 mm Hardened steel")
+        script.onSourceSignal({"source": oldSource})
+        script.applySourceUpdates()
+
+        self.assertRendered(script.getSourceHandle(self.sourceName), "0.6 mm Hardened steel", 2)
+
+
+if __name__ == "__main__":
+    unittest.main()